@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the GitHub and Forgejo APIs, for benchmarks.
+
+FakeGitHub serves a generated starred list through the REST endpoints
+(paginated with Link headers) and GraphQL, the repository endpoint and
+/rate_limit, and sends GitHub's X-RateLimit-* headers with every response,
+refusing requests once the budget is spent. FakeForgejo accepts migrations
+(/api/v1/repos/migrate) and repository creation (/api/v1/user/repos),
+answers with 409 for repositories it already has, and can be made slow or
+unreliable. Both record how long they took to answer each request.
+
+Run on its own to point the scripts at it by hand:
+
+    python3 bench/fake_services.py --stars 2000 --latency 0.2 --error-rate 0.05
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import forgejo_api
+from timing import percentile
+
+# (status, extra headers, JSON body)
+Reply = Tuple[int, Dict[str, str], Any]
+
+class RequestLog:
+    """Time taken to answer each request, per route and status."""
+
+    def __init__(self):
+        self._samples: Dict[str, List[float]] = {}
+        self._statuses: Dict[str, Dict[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(route, []).append(seconds)
+            counts = self._statuses.setdefault(route, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, statuses and p50/p95/p99 seconds per route."""
+        with self._lock:
+            samples = {route: sorted(values) for route, values in self._samples.items()}
+            statuses = {route: dict(counts) for route, counts in self._statuses.items()}
+        return {route: {'count': len(values), 'statuses': statuses[route],
+                        'p50': percentile(values, 50), 'p95': percentile(values, 95),
+                        'p99': percentile(values, 99)}
+                for route, values in samples.items()}
+
+class FakeService:
+    """Routes requests to handler methods and simulates latency."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        """
+        Args:
+            latency: Mean seconds added to the slow requests of the service
+            jitter: Latency varies uniformly by this fraction around the mean
+            seed: Seed of the random generator, for repeatable runs
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.log = RequestLog()
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.url = ''
+
+    def chance(self, rate: float) -> bool:
+        with self._random_lock:
+            return self.random.random() < rate
+
+    def delay(self) -> None:
+        if self.latency <= 0:
+            return
+        with self._random_lock:
+            factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+        time.sleep(self.latency * max(0.0, factor))
+
+    def route(self, method: str, path: str) -> Tuple[str, Any, Tuple[str, ...]]:
+        """Return (route name, handler, path arguments) for a request."""
+        raise NotImplementedError
+
+    def handle(self, method: str, path: str, query: Dict[str, str],
+               headers: Any, body: Any) -> Tuple[str, Reply]:
+        name, handler, args = self.route(method, path)
+        if handler is None:
+            return name, (404, {}, {'message': 'Not Found'})
+        return name, handler(query, headers, body, *args)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this, delayed ACKs add 40ms
+    disable_nagle_algorithm = True
+
+    def _serve(self, method: str) -> None:
+        started = time.monotonic()
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            body = None
+        parsed = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        service: FakeService = self.server.service
+        route, (status, headers, payload) = service.handle(method, parsed.path, query,
+                                                           self.headers, body)
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+        service.log.record(f"{method} {route}", status, time.monotonic() - started)
+
+    def do_GET(self):
+        self._serve('GET')
+
+    def do_POST(self):
+        self._serve('POST')
+
+    def log_message(self, *args):
+        pass
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def serve(service: FakeService, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Serve a fake service from a background thread; its address is set in service.url."""
+    server = _Server((host, port), _Handler)
+    server.service = service
+    service.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def generate_stars(count: int, owners: int = 50, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Starred repositories, most recently starred first, with sizes following
+    a log-normal distribution (median about 1 MB, a few of several GB).
+    """
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def stamp(hours_ago: int) -> str:
+        return (now - timedelta(hours=hours_ago)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    stars = []
+    for i in range(count):
+        owner = f"owner{i % owners:03d}"
+        name = f"repo{i:05d}"
+        stars.append({
+            'full_name': f"{owner}/{name}",
+            'name': name,
+            'owner': {'login': owner},
+            'size': min(int(rng.lognormvariate(7, 2)), 5_000_000),  # KB, like GitHub
+            'fork': False,
+            'pushed_at': stamp(rng.randint(0, 20000)),
+            'starred_at': stamp(i),
+        })
+    return stars
+
+class FakeGitHub(FakeService):
+    """The parts of the GitHub API the exporter and the migration scripts use."""
+
+    def __init__(self, stars: List[Dict[str, Any]], rate_limit: int = 5000,
+                 reset_after: float = 3600, **kwargs):
+        """
+        Args:
+            stars: Starred repositories, as made by generate_stars
+            rate_limit: Requests allowed per resource (core, graphql) and window
+            reset_after: Seconds until the rate-limit window resets
+        """
+        super().__init__(**kwargs)
+        self.stars = stars
+        self.by_name = {star['full_name']: star for star in stars}
+        self.limit = rate_limit
+        self.reset_after = reset_after
+        self._used: Dict[str, int] = {}
+        self._reset = time.time() + reset_after
+        self._budget_lock = threading.Lock()
+
+    def route(self, method: str, path: str) -> Tuple[str, Any, Tuple[str, ...]]:
+        if method == 'GET' and (path == '/user/starred' or re.fullmatch(r'/users/[^/]+/starred', path)):
+            return '/user/starred', self.starred, (path,)
+        if method == 'GET' and path == '/rate_limit':
+            return '/rate_limit', self.rate_limit, ()
+        match = re.fullmatch(r'/repos/([^/]+)/([^/]+)', path)
+        if method == 'GET' and match:
+            return '/repos/{owner}/{repo}', self.repo, match.groups()
+        if method == 'POST' and path == '/graphql':
+            return '/graphql', self.graphql, ()
+        return path, None, ()
+
+    def handle(self, method: str, path: str, query: Dict[str, str],
+               headers: Any, body: Any) -> Tuple[str, Reply]:
+        resource = 'graphql' if path == '/graphql' else 'core'
+        if path == '/rate_limit':
+            return super().handle(method, path, query, headers, body)
+        rate_headers, allowed = self._spend(resource)
+        if not allowed:
+            return path, (403, rate_headers, {'message': 'API rate limit exceeded'})
+        self.delay()
+        name, (status, extra, payload) = super().handle(method, path, query, headers, body)
+        return name, (status, {**rate_headers, **extra}, payload)
+
+    def _spend(self, resource: str) -> Tuple[Dict[str, str], bool]:
+        with self._budget_lock:
+            if time.time() >= self._reset:
+                self._used.clear()
+                self._reset = time.time() + self.reset_after
+            used = self._used.get(resource, 0)
+            allowed = used < self.limit
+            if allowed:
+                used = self._used[resource] = used + 1
+            reset = int(self._reset)
+        return {'X-RateLimit-Limit': str(self.limit),
+                'X-RateLimit-Remaining': str(self.limit - used),
+                'X-RateLimit-Used': str(used),
+                'X-RateLimit-Reset': str(reset),
+                'X-RateLimit-Resource': resource}, allowed
+
+    def starred(self, query: Dict[str, str], headers: Any, body: Any, path: str) -> Reply:
+        per_page = min(int(query.get('per_page', 30)), 100)
+        page = max(int(query.get('page', 1)), 1)
+        stars = self.stars if query.get('direction', 'desc') == 'desc' else self.stars[::-1]
+        items = stars[(page - 1) * per_page:page * per_page]
+        if 'star+json' in headers.get('Accept', ''):
+            items = [{'starred_at': star['starred_at'], 'repo': star} for star in items]
+        last = max(1, -(-len(stars) // per_page))
+        links = []
+        base = f"{self.url}{path}"
+        for rel, number in (('prev', page - 1), ('next', page + 1), ('first', 1), ('last', last)):
+            if 1 <= number <= last and (rel in ('first', 'last') or number != page):
+                params = {**query, 'per_page': per_page, 'page': number}
+                links.append(f'<{base}?{urlencode(params)}>; rel="{rel}"')
+        return 200, {'Link': ', '.join(links)} if last > 1 else {}, items
+
+    def repo(self, query: Dict[str, str], headers: Any, body: Any,
+             owner: str, name: str) -> Reply:
+        star = self.by_name.get(f"{owner}/{name}")
+        if star is None:
+            return 404, {}, {'message': 'Not Found'}
+        return 200, {}, star
+
+    def rate_limit(self, query: Dict[str, str], headers: Any, body: Any) -> Reply:
+        with self._budget_lock:
+            resources = {resource: {'limit': self.limit, 'used': self._used.get(resource, 0),
+                                    'remaining': self.limit - self._used.get(resource, 0),
+                                    'reset': int(self._reset)}
+                         for resource in ('core', 'graphql', 'search')}
+        return 200, {}, {'resources': resources}
+
+    def graphql(self, query: Dict[str, str], headers: Any, body: Any) -> Reply:
+        variables = (body or {}).get('variables') or {}
+        if 'repository(' in (body or {}).get('query', ''):
+            return self.graphql_repos(variables)
+        first = min(int(variables.get('first') or 30), 100)
+        start = int(variables.get('after') or 0)
+        items = self.stars[start:start + first]
+        end = start + len(items)
+        stars = {
+            'pageInfo': {'hasNextPage': end < len(self.stars), 'endCursor': str(end)},
+            'edges': [{'starredAt': star['starred_at'],
+                       'node': {'nameWithOwner': star['full_name'], 'diskUsage': star['size'],
+                                'pushedAt': star['pushed_at']}}
+                      for star in items],
+        }
+        key = 'viewer' if variables.get('viewer') else 'user'
+        return 200, {}, {'data': {key: {'starredRepositories': stars}}}
+
+    def graphql_repos(self, variables: Dict[str, str]) -> Reply:
+        """Answer repository lookups aliased r0, r1, ... with owner $o<i> and name $n<i>."""
+        data = {}
+        i = 0
+        while f"o{i}" in variables:
+            star = self.by_name.get(f"{variables[f'o{i}']}/{variables[f'n{i}']}")
+            data[f"r{i}"] = None if star is None else {
+                'nameWithOwner': star['full_name'], 'isFork': star['fork'],
+                'parent': {'nameWithOwner': star['parent']} if star.get('parent') else None}
+            i += 1
+        return 200, {}, {'data': data}
+
+class FakeForgejo(FakeService):
+    """
+    The parts of the Forgejo API the migration scripts use.
+
+    Latency and errors apply to migrations and repository creation; reads
+    are answered at once.
+    """
+
+    def __init__(self, owner: str = 'bench', error_rate: float = 0.0,
+                 repos_dir: Optional[str] = None, max_page_size: int = 50, **kwargs):
+        """
+        Args:
+            owner: Login of the token's user
+            error_rate: Share of migrations and creations answered with HTTP 500
+            repos_dir: Create a bare git repository here for every repository
+                       created, so that its clone_url can be pushed to
+            max_page_size: Cap on the items of a listing page, whatever the
+                           client asks for (Forgejo's MAX_RESPONSE_ITEMS)
+        """
+        super().__init__(**kwargs)
+        self.owner = owner
+        self.error_rate = error_rate
+        self.repos_dir = repos_dir
+        self.max_page_size = max_page_size
+        self.repos: Dict[str, Dict[str, Any]] = {}
+        self._repos_lock = threading.Lock()
+
+    def route(self, method: str, path: str) -> Tuple[str, Any, Tuple[str, ...]]:
+        if method == 'POST' and path == '/api/v1/repos/migrate':
+            return '/repos/migrate', self.migrate, ()
+        if method == 'POST' and path == '/api/v1/user/repos':
+            return '/user/repos', self.create, ()
+        if method == 'GET' and path == '/api/v1/user':
+            return '/user', self.user, ()
+        match = re.fullmatch(r'/api/v1/(users|orgs)/([^/]+)/repos', path)
+        if method == 'GET' and match:
+            return f'/{match.group(1)}/{{owner}}/repos', self.list_repos, match.groups()
+        match = re.fullmatch(r'/api/v1/repos/([^/]+)/([^/]+)', path)
+        if method == 'GET' and match:
+            return '/repos/{owner}/{repo}', self.repo, match.groups()
+        return path, None, ()
+
+    def seed(self, full_names: List[str]) -> None:
+        """
+        Make mirrors of GitHub repositories exist before the run, as if an
+        earlier run had created them, to be answered with 409.
+        """
+        for full_name in full_names:
+            self._add(self.owner, full_name.split('/')[1],
+                      forgejo_api.mirror_description(full_name))
+
+    def _add(self, owner: str, name: str, description: str = '') -> Optional[Dict[str, Any]]:
+        """Create a repository, or return None if it already exists."""
+        with self._repos_lock:
+            if (owner, name.lower()) in self.repos:
+                return None
+            repo = self.repos[(owner, name.lower())] = {
+                'name': name, 'full_name': f"{owner}/{name}", 'owner': {'login': owner},
+                'description': description, 'empty': False,
+                'clone_url': f"{self.url}/{owner}/{name}.git"}
+        if self.repos_dir:
+            path = Path(self.repos_dir, owner, f"{name}.git")
+            subprocess.run(['git', 'init', '--bare', '--quiet', str(path)], check=True)
+            repo['clone_url'] = path.resolve().as_uri()
+        return repo
+
+    def _write(self, owner: str, name: str, description: str) -> Reply:
+        self.delay()
+        if self.chance(self.error_rate):
+            return 500, {}, {'message': 'simulated server error'}
+        repo = self._add(owner, name, description)
+        if repo is None:
+            return 409, {}, {'message': 'The repository with the same name already exists.'}
+        return 201, {}, repo
+
+    def migrate(self, query: Dict[str, str], headers: Any, body: Any) -> Reply:
+        body = body or {}
+        return self._write(body.get('repo_owner') or self.owner, body.get('repo_name', ''),
+                           body.get('description', ''))
+
+    def create(self, query: Dict[str, str], headers: Any, body: Any) -> Reply:
+        body = body or {}
+        return self._write(self.owner, body.get('name', ''), body.get('description', ''))
+
+    def user(self, query: Dict[str, str], headers: Any, body: Any) -> Reply:
+        return 200, {}, {'login': self.owner}
+
+    def list_repos(self, query: Dict[str, str], headers: Any, body: Any,
+                   kind: str, owner: str) -> Reply:
+        if kind == 'orgs' and owner == self.owner:
+            return 404, {}, {'message': 'Not Found'}
+        limit = min(int(query.get('limit', 30)), self.max_page_size)
+        page = max(int(query.get('page', 1)), 1)
+        with self._repos_lock:
+            repos = [repo for (repo_owner, _), repo in sorted(self.repos.items())
+                     if repo_owner == owner]
+        return 200, {'X-Total-Count': str(len(repos))}, repos[(page - 1) * limit:page * limit]
+
+    def repo(self, query: Dict[str, str], headers: Any, body: Any,
+             owner: str, name: str) -> Reply:
+        with self._repos_lock:
+            repo = self.repos.get((owner, name.lower()))
+        if repo is None:
+            return 404, {}, {'message': 'Not Found'}
+        return 200, {}, repo
+
+def print_log(title: str, service: FakeService) -> None:
+    print(f"\n{title}:")
+    print(f"{'Route':<36} {'Count':>6} {'p50':>8} {'p95':>8} {'p99':>8}  Statuses")
+    for route, stats in sorted(service.log.summary().items()):
+        statuses = ' '.join(f"{status}×{count}" for status, count in sorted(stats['statuses'].items()))
+        print(f"{route:<36} {stats['count']:>6} {stats['p50']:>7.3f}s {stats['p95']:>7.3f}s "
+              f"{stats['p99']:>7.3f}s  {statuses}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stars', type=int, default=500, help="starred repositories (default 500)")
+    parser.add_argument('--github-port', type=int, default=0)
+    parser.add_argument('--forgejo-port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="mean seconds per Forgejo migration or creation")
+    parser.add_argument('--jitter', type=float, default=0.5,
+                        help="latency varies by this fraction around the mean (default 0.5)")
+    parser.add_argument('--github-latency', type=float, default=0.0,
+                        help="mean seconds per GitHub API request")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="share of Forgejo writes failing with HTTP 500")
+    parser.add_argument('--existing', type=float, default=0.0,
+                        help="share of the starred repositories already on Forgejo (HTTP 409)")
+    parser.add_argument('--rate-limit', type=int, default=5000,
+                        help="GitHub requests per resource and window (default 5000)")
+    parser.add_argument('--rate-window', type=float, default=3600,
+                        help="seconds until the GitHub rate limit resets (default 3600)")
+    parser.add_argument('--repos-dir', help="create pushable bare repositories here")
+    parser.add_argument('--max-page-size', type=int, default=50,
+                        help="most repositories per Forgejo listing page (default 50)")
+    args = parser.parse_args()
+
+    github = FakeGitHub(generate_stars(args.stars), rate_limit=args.rate_limit,
+                        reset_after=args.rate_window,
+                        latency=args.github_latency, jitter=args.jitter)
+    forgejo = FakeForgejo(error_rate=args.error_rate, repos_dir=args.repos_dir,
+                          max_page_size=args.max_page_size,
+                          latency=args.latency, jitter=args.jitter)
+    serve(github, port=args.github_port)
+    serve(forgejo, port=args.forgejo_port)
+    existing = int(len(github.stars) * args.existing)
+    forgejo.seed([star['full_name'] for star in github.stars[len(github.stars) - existing:]])
+
+    print(f"export GITHUB_API_URL={github.url} GITHUB_TOKEN=bench GITHUB_URL={github.url}")
+    print(f"export FORGEJO_URL={forgejo.url} FORGEJO_TOKEN=bench FORGEJO_USER={forgejo.owner}")
+    print("Serving until interrupted")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    print_log("GitHub", github)
+    print_log("Forgejo", forgejo)
+
+if __name__ == '__main__':
+    main()
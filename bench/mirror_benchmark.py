@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Mirror throughput of migrate_repos.py on synthetic repositories.
+
+Generates repositories with synthetic_repos.py, serves them over file://,
+git daemon or smart HTTP in place of GitHub, and mirrors them with
+migrate_repos.py to a fake Forgejo whose repositories are local bare
+repositories. Each setup runs sequentially (one clone and one push worker)
+and in parallel:
+
+- scratch: a temporary mirror per repository, deleted after the push
+- cold: through an empty MIRROR_CACHE, which the run fills
+- cached: the same cache and Forgejo again, after a few commits were added
+  to every source repository, so only the changes are fetched and pushed
+
+Throughput is the size and ref count of the source repositories divided by
+the wall time, so cached runs show how much faster a refresh is than a full
+copy; the data actually fetched is reported next to it.
+
+    python3 bench/mirror_benchmark.py --repos 8 --size 50M --transport daemon --parallel 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_services import FakeForgejo, FakeGitHub, serve
+from mirror_cache import dir_size
+from run_benchmarks import run_script
+from synthetic_repos import (TRANSPORTS, add_spec_arguments, append_commits, generate_repo,
+                             repo_stats, serve_repos, spec_from_args)
+
+class MirrorBenchmark:
+    """Runs migrate_repos.py over the source repositories in several setups."""
+
+    def __init__(self, args: argparse.Namespace, work: Path, source: Path,
+                 names: List[str], url: str):
+        self.args = args
+        self.work = work
+        self.source = source
+        self.names = names
+        self.url = url
+        self.results: List[Dict[str, Any]] = []
+        self._servers = []
+
+    def source_stats(self) -> Dict[str, Tuple[int, int]]:
+        return {name: repo_stats(self.source / f"{name}.git") for name in self.names}
+
+    def forgejo(self, label: str) -> FakeForgejo:
+        forgejo = FakeForgejo(repos_dir=str(self.work / f"forgejo-{label}"))
+        self._servers.append(serve(forgejo))
+        return forgejo
+
+    def run(self, label: str, workers: int, forgejo: FakeForgejo,
+            cache: Optional[Path] = None) -> None:
+        stats = self.source_stats()
+        size = sum(size for size, _ in stats.values())
+        refs = sum(count for _, count in stats.values())
+        stars = [{'full_name': name, 'name': name.split('/')[1],
+                  'owner': {'login': name.split('/')[0]}, 'size': stats[name][0] // 1024,
+                  'fork': False} for name in self.names]
+        # Serves repository metadata, asked for when forks are planned in the cache
+        github = FakeGitHub(stars)
+        self._servers.append(serve(github))
+        repos = self.work / f"{label}.txt"
+        repos.write_text(''.join(f"{name} {stats[name][0]}\n" for name in self.names))
+        scratch = self.work / 'scratch'
+        scratch.mkdir(exist_ok=True)
+        env = {'GITHUB_URL': self.url, 'CLONE_WORKERS': str(workers),
+               'PUSH_WORKERS': str(workers), 'SCRATCH_DIR': str(scratch)}
+        if cache is not None:
+            env['MIRROR_CACHE'] = str(cache)
+        cached_before = dir_size(str(cache)) if cache is not None else 0
+        result = run_script(self.work, label, 'migrate_repos.py', [str(repos)], len(self.names),
+                            github, forgejo, **env)
+        seconds = max(result['seconds'], 1e-6)
+        result.update({
+            'workers': workers,
+            'bytes': size,
+            'refs': refs,
+            # A scratch run fetches everything; a cache keeps what it fetched
+            'fetched_bytes': dir_size(str(cache)) - cached_before if cache is not None else size,
+            'mb_per_second': round(size / 1024 ** 2 / seconds, 2),
+            'refs_per_second': round(refs / seconds, 1),
+        })
+        self.results.append(result)
+
+    def run_all(self) -> None:
+        modes = [('sequential', 1), ('parallel', self.args.parallel)]
+        for mode, workers in modes:
+            self.run(f"{mode}-scratch", workers, self.forgejo(f"{mode}-scratch"))
+        caches = {}
+        for mode, workers in modes:
+            caches[mode] = (self.forgejo(f"{mode}-cache"), self.work / f"cache-{mode}")
+            self.run(f"{mode}-cold", workers, *caches[mode])
+        if self.args.update_commits:
+            print(f"Adding {self.args.update_commits} commits to every repository...", flush=True)
+            for name in self.names:
+                append_commits(self.source / f"{name}.git", self.args.update_commits,
+                               spec_from_args(self.args))
+        for mode, workers in modes:
+            self.run(f"{mode}-cached", workers, *caches[mode])
+
+    def shutdown(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"\n{'Scenario':<18} {'Workers':>7} {'Repos':>5} {'Refs':>6} {'MB':>8} {'Fetched':>8} "
+          f"{'Seconds':>8} {'MB/s':>8} {'Refs/s':>8} {'Exit':>5}")
+    for result in results:
+        print(f"{result['scenario']:<18} {result['workers']:>7} {result['repos']:>5} "
+              f"{result['refs']:>6} {result['bytes'] / 1024 ** 2:>8.1f} "
+              f"{result['fetched_bytes'] / 1024 ** 2:>8.1f} {result['seconds']:>8.2f} "
+              f"{result['mb_per_second']:>8.2f} {result['refs_per_second']:>8.1f} "
+              f"{result['exit_code']:>5}")
+    print(f"\n{'Scenario':<18} {'Phase':<10} {'Count':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for result in results:
+        for phase, stats in result['phases'].items():
+            if phase in ('clone', 'fetch', 'push'):
+                print(f"{result['scenario']:<18} {phase:<10} {stats['count']:>6} "
+                      f"{stats['p50']:>7.2f}s {stats['p95']:>7.2f}s {stats['p99']:>7.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repos', type=int, default=8, help="repositories to mirror (default 8)")
+    parser.add_argument('--transport', choices=TRANSPORTS, default='file',
+                        help="how the source repositories are served (default file)")
+    parser.add_argument('--parallel', type=int, default=4,
+                        help="clone and push workers of the parallel runs (default 4)")
+    parser.add_argument('--update-commits', type=int, default=5,
+                        help="commits added to every repository before the cached runs (default 5)")
+    parser.add_argument('--repos-dir',
+                        help="generate the source repositories here, or reuse those already "
+                             "there; the cached runs add commits to them")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--keep', action='store_true',
+                        help="keep the scratch directory and logs even if every run succeeds")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix='munchiehub-mirror-bench-'))
+    source = Path(args.repos_dir) if args.repos_dir else work / 'github'
+    names = [f"synthetic/repo{i:03d}" for i in range(args.repos)]
+    missing = [i for i, name in enumerate(names) if not (source / f"{name}.git").is_dir()]
+    if missing:
+        print(f"Generating {len(missing)} repositories...", flush=True)
+        for i in missing:
+            generate_repo(source / f"{names[i]}.git", spec_from_args(args), args.seed + i)
+
+    url, stop = serve_repos(source, args.transport)
+    bench = MirrorBenchmark(args, work, source, names, url)
+    try:
+        bench.run_all()
+    finally:
+        stop()
+        bench.shutdown()
+        print_results(bench.results)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(bench.results, f, indent=2)
+        if args.keep or any(result['exit_code'] for result in bench.results):
+            print(f"\nScratch directory and logs kept in {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
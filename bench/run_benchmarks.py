@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmarks of the exporter and both migration scripts.
+
+Each scenario starts fresh fake GitHub and Forgejo services on local ports
+(see fake_services.py), runs the script against them as a subprocess, and
+reports repositories per second along with latency percentiles: per phase
+from the script's own TIMING_FILE, and per endpoint as measured by the fake
+services.
+
+    python3 bench/run_benchmarks.py --stars 1000 --latency 0.1 --error-rate 0.02
+
+The scripts' own client-side rate limits are lifted (FORGEJO_RATE and
+GITHUB_RATE set to 0) unless they are set in the environment, so that the
+numbers show the pipeline rather than the pacing. Any other setting of the
+scripts (CONCURRENCY, CLONE_WORKERS, ...) is passed through as well.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_services import FakeForgejo, FakeGitHub, generate_stars, serve
+from synthetic_repos import RepoSpec, generate_repos
+from timing import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ('export-rest', 'export-graphql', 'migrate_repos2', 'migrate_repos')
+
+def phase_stats(path: Path) -> Dict[str, Dict[str, float]]:
+    """Count and p50/p95/p99 seconds per phase of a TIMING_FILE."""
+    samples: Dict[str, List[float]] = {}
+    if path.exists():
+        for line in path.read_text().splitlines():
+            sample = json.loads(line)
+            samples.setdefault(sample['phase'], []).append(sample['seconds'])
+    stats = {}
+    for phase, values in samples.items():
+        values.sort()
+        stats[phase] = {'count': len(values), 'p50': percentile(values, 50),
+                        'p95': percentile(values, 95), 'p99': percentile(values, 99)}
+    return stats
+
+def run_script(work: Path, name: str, script: str, argv: List[str], units: int,
+               github: FakeGitHub, forgejo: FakeForgejo, **env: str) -> Dict[str, Any]:
+    """
+    Run one of the scripts against the fake services.
+
+    Args:
+        work: Working directory of the script, where its log and timings go
+        name: Name of the scenario
+        script: Script file, relative to the repository root
+        argv: Command-line arguments of the script
+        units: Repositories the run processes, for the throughput
+        **env: Environment variables set for the script
+
+    Returns:
+        Wall time, repositories per second, exit code and latency percentiles
+    """
+    timing_file = work / f"{name}.timing.jsonl"
+    environment = dict(os.environ)
+    environment.setdefault('FORGEJO_RATE', '0')
+    environment.setdefault('GITHUB_RATE', '0')
+    environment.update({
+        'GITHUB_API_URL': github.url,
+        'GITHUB_TOKEN': 'bench',
+        'FORGEJO_URL': forgejo.url,
+        'FORGEJO_TOKEN': 'bench',
+        'FORGEJO_USER': forgejo.owner,
+        'TIMING_FILE': str(timing_file),
+        'JOURNAL_FILE': '',
+        'PROGRESS': 'off',
+        **env,
+    })
+    log = work / f"{name}.log"
+    print(f"Running {name} ({units} repositories)...", flush=True)
+    started = time.monotonic()
+    with open(log, 'w') as out:
+        result = subprocess.run([sys.executable, str(ROOT / script)] + argv, cwd=work,
+                                env=environment, stdout=out, stderr=subprocess.STDOUT)
+    elapsed = time.monotonic() - started
+    return {
+        'scenario': name,
+        'repos': units,
+        'seconds': round(elapsed, 3),
+        'repos_per_second': round(units / elapsed, 2),
+        'exit_code': result.returncode,
+        'log': str(log),
+        'phases': phase_stats(timing_file),
+        'github': github.log.summary(),
+        'forgejo': forgejo.log.summary(),
+    }
+
+class Benchmark:
+    """Runs the scenarios in a scratch directory and collects their results."""
+
+    def __init__(self, args: argparse.Namespace, work: Path):
+        self.args = args
+        self.work = work
+        self.stars = generate_stars(args.stars, seed=args.seed)
+        self.results: List[Dict[str, Any]] = []
+
+    def services(self, repos_dir: Optional[Path] = None):
+        github = FakeGitHub(self.stars, rate_limit=self.args.rate_limit,
+                            reset_after=self.args.rate_window,
+                            latency=self.args.github_latency, jitter=self.args.jitter,
+                            seed=self.args.seed)
+        forgejo = FakeForgejo(error_rate=self.args.error_rate,
+                              repos_dir=str(repos_dir) if repos_dir else None,
+                              latency=self.args.latency, jitter=self.args.jitter,
+                              seed=self.args.seed)
+        servers = [serve(github), serve(forgejo)]
+        # The last ones, so that a short migrate_repos list still creates repositories
+        existing = int(len(self.stars) * self.args.existing)
+        forgejo.seed([star['full_name'] for star in self.stars[len(self.stars) - existing:]])
+        return github, forgejo, servers
+
+    def run(self, name: str, script: str, argv: List[str], units: int,
+            github: FakeGitHub, forgejo: FakeForgejo, **env: str) -> None:
+        self.results.append(run_script(self.work, name, script, argv, units,
+                                       github, forgejo, **env))
+
+    def repo_list(self, name: str, count: int) -> Path:
+        path = self.work / f"{name}.txt"
+        path.write_text(''.join(f"{star['full_name']} {star['size'] * 1024}\n"
+                                for star in self.stars[:count]))
+        return path
+
+    def export(self, api: str) -> None:
+        github, forgejo, servers = self.services()
+        try:
+            self.run(f"export-{api}", 'starred_export.py', [], len(self.stars),
+                     github, forgejo, EXPORT_API=api)
+        finally:
+            for server in servers:
+                server.shutdown()
+
+    def migrate_api(self) -> None:
+        github, forgejo, servers = self.services()
+        try:
+            repos = self.repo_list('migrate_repos2', len(self.stars))
+            self.run('migrate_repos2', 'migrate_repos2.py', [], len(self.stars),
+                     github, forgejo, REPOS_FILE=str(repos), GITHUB_URL=github.url)
+        finally:
+            for server in servers:
+                server.shutdown()
+
+    def migrate_git(self) -> None:
+        count = min(self.args.git_repos, len(self.stars))
+        source = self.work / 'github'
+        # Small ones: this measures the per-repository overhead, mirror_benchmark.py the data
+        generate_repos(source, [star['full_name'] for star in self.stars[:count]],
+                       RepoSpec(size=64 * 1024, commits=5, branches=1, tags=1), self.args.seed)
+        github, forgejo, servers = self.services(self.work / 'forgejo')
+        try:
+            repos = self.repo_list('migrate_repos', count)
+            self.run('migrate_repos', 'migrate_repos.py', [str(repos)], count,
+                     github, forgejo, GITHUB_URL=source.as_uri(), SCRATCH_DIR=str(self.work))
+        finally:
+            for server in servers:
+                server.shutdown()
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    print(f"\n{'Scenario':<16} {'Repos':>6} {'Seconds':>8} {'Repos/s':>8} {'Exit':>5}")
+    for result in results:
+        print(f"{result['scenario']:<16} {result['repos']:>6} {result['seconds']:>8.2f} "
+              f"{result['repos_per_second']:>8.2f} {result['exit_code']:>5}")
+    for result in results:
+        print(f"\n{result['scenario']}")
+        print(f"  {'Phase or endpoint':<34} {'Count':>6} {'p50':>8} {'p95':>8} {'p99':>8}  Statuses")
+        rows = [(f"phase {phase}", stats) for phase, stats in result['phases'].items()]
+        for service in ('github', 'forgejo'):
+            rows += [(f"{service} {route}", stats) for route, stats in sorted(result[service].items())]
+        for label, stats in rows:
+            statuses = ' '.join(f"{status}×{count}"
+                                for status, count in sorted(stats.get('statuses', {}).items()))
+            print(f"  {label:<34} {stats['count']:>6} {stats['p50']:>7.3f}s "
+                  f"{stats['p95']:>7.3f}s {stats['p99']:>7.3f}s  {statuses}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f"scenarios to run: {', '.join(SCENARIOS)} (default all)")
+    parser.add_argument('--stars', type=int, default=500,
+                        help="starred repositories, exported and migrated through the API (default 500)")
+    parser.add_argument('--git-repos', type=int, default=20,
+                        help="repositories really cloned and pushed by migrate_repos.py (default 20)")
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="mean seconds per Forgejo migration or creation (default 0.05)")
+    parser.add_argument('--github-latency', type=float, default=0.0,
+                        help="mean seconds per GitHub API request")
+    parser.add_argument('--jitter', type=float, default=0.5,
+                        help="latency varies by this fraction around the mean (default 0.5)")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="share of Forgejo writes failing with HTTP 500")
+    parser.add_argument('--existing', type=float, default=0.0,
+                        help="share of repositories already on Forgejo, answered with 409 "
+                             "(with PREFLIGHT=false; otherwise skipped up front)")
+    parser.add_argument('--rate-limit', type=int, default=5000,
+                        help="GitHub requests per resource and window (default 5000)")
+    parser.add_argument('--rate-window', type=float, default=3600,
+                        help="seconds until the GitHub rate limit resets (default 3600)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help="also write the results to this file")
+    parser.add_argument('--keep', action='store_true',
+                        help="keep the scratch directory and logs even if every script succeeds")
+    args = parser.parse_args()
+    scenarios = args.scenarios or list(SCENARIOS)
+    unknown = [scenario for scenario in scenarios if scenario not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    work = Path(tempfile.mkdtemp(prefix='munchiehub-bench-'))
+    bench = Benchmark(args, work)
+    runners = {
+        'export-rest': lambda: bench.export('rest'),
+        'export-graphql': lambda: bench.export('graphql'),
+        'migrate_repos2': bench.migrate_api,
+        'migrate_repos': bench.migrate_git,
+    }
+    try:
+        for scenario in scenarios:
+            runners[scenario]()
+    finally:
+        print_results(bench.results)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(bench.results, f, indent=2)
+        if args.keep or any(result['exit_code'] for result in bench.results):
+            print(f"\nScratch directory and logs kept in {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
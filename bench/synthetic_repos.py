@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Synthetic git repositories for mirror benchmarks.
+
+Repositories are written in one pass through `git fast-import`, so a
+repository of hundreds of megabytes and thousands of commits takes seconds
+instead of a checkout and commit per revision. The shape is configurable:
+total size, number of commits on main, extra branches (each with a commit
+of its own) and annotated tags, and the blob size distribution, log-normal
+around a median so that most files are small and a few are large. Part of
+each blob is random and does not compress, like binaries and packed assets.
+
+The repositories can be served like GitHub would serve them, over file://,
+git:// (git daemon) or smart HTTP (git http-backend):
+
+    python3 bench/synthetic_repos.py /tmp/repos --count 8 --size 50M --serve daemon
+"""
+
+import argparse
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import BinaryIO, Callable, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mirror_cache import dir_size, read_refs
+from units import parse_size
+
+TRANSPORTS = ('file', 'daemon', 'http')
+
+AUTHOR = 'Bench <bench@localhost>'
+EPOCH = 1_600_000_000
+
+class RepoSpec(NamedTuple):
+    size: int = 10 * 1024 ** 2     # bytes of blob content, before compression
+    commits: int = 100             # commits on main
+    branches: int = 5              # branches besides main
+    tags: int = 5                  # annotated tags on main
+    blob_median: int = 16 * 1024   # median blob size in bytes
+    blob_sigma: float = 1.5        # spread of the log-normal blob sizes
+    compressible: float = 0.5      # share of each blob that compresses well
+
+class _Writer:
+    """Emits a fast-import stream, numbering marks."""
+
+    def __init__(self, out: BinaryIO, spec: RepoSpec, rng: random.Random):
+        self.out = out
+        self.spec = spec
+        self.rng = rng
+        self.mark = 0
+        self.paths: List[str] = []
+        self.time = EPOCH
+
+    def _data(self, payload: bytes) -> None:
+        self.out.write(b'data %d\n' % len(payload))
+        self.out.write(payload)
+        self.out.write(b'\n')
+
+    def blob(self, size: int) -> int:
+        compressible = int(size * self.spec.compressible)
+        line = b'synthetic benchmark content %d\n' % self.rng.randrange(1 << 30)
+        payload = (line * (compressible // len(line) + 1))[:compressible]
+        payload += self.rng.randbytes(size - compressible)
+        self.mark += 1
+        self.out.write(b'blob\nmark :%d\n' % self.mark)
+        self._data(payload)
+        return self.mark
+
+    def blob_size(self, limit: int) -> int:
+        size = self.rng.lognormvariate(math.log(max(self.spec.blob_median, 1)), self.spec.blob_sigma)
+        return max(1, min(int(size), limit))
+
+    def path(self) -> str:
+        """A new file most of the time, otherwise one to modify."""
+        if self.paths and self.rng.random() < 0.3:
+            return self.rng.choice(self.paths)
+        count = len(self.paths)
+        path = f"dir{count // 20:04d}/file{count:06d}.bin"
+        self.paths.append(path)
+        return path
+
+    def commit(self, ref: str, budget: int, parent: str = '', message: str = '') -> int:
+        """Commit blobs totalling about budget bytes on ref."""
+        changes: List[Tuple[str, int]] = []
+        while budget > 0:
+            size = self.blob_size(budget)
+            changes.append((self.path(), self.blob(size)))
+            budget -= size
+        self.mark += 1
+        self.time += self.rng.randint(60, 86400)
+        self.out.write(b'commit %s\nmark :%d\n' % (ref.encode(), self.mark))
+        stamp = b'%s %d +0000' % (AUTHOR.encode(), self.time)
+        self.out.write(b'author %s\ncommitter %s\n' % (stamp, stamp))
+        self._data((message or f"Synthetic commit {self.mark}").encode())
+        if parent:
+            self.out.write(b'from %s\n' % parent.encode())
+        self.out.write(b'M 100644 inline CHANGES\n')
+        self._data(b'%d\n' % self.mark)
+        for path, blob in changes:
+            self.out.write(b'M 100644 :%d %s\n' % (blob, path.encode()))
+        return self.mark
+
+    def tag(self, name: str, commit: int) -> None:
+        self.out.write(b'tag %s\nfrom :%d\n' % (name.encode(), commit))
+        self.out.write(b'tagger %s %d +0000\n' % (AUTHOR.encode(), self.time))
+        self._data(f"Release {name}".encode())
+
+def _fast_import(path: Path, write: Callable[[BinaryIO], None]) -> None:
+    process = subprocess.Popen(['git', '--git-dir', str(path), 'fast-import', '--quiet'],
+                               stdin=subprocess.PIPE)
+    try:
+        write(process.stdin)
+    finally:
+        process.stdin.close()
+    if process.wait() != 0:
+        raise subprocess.CalledProcessError(process.returncode, 'git fast-import')
+
+def generate_repo(path: Path, spec: RepoSpec, seed: int = 0) -> None:
+    """Create a bare repository at path, replacing whatever is there."""
+    shutil.rmtree(path, ignore_errors=True)
+    subprocess.run(['git', 'init', '--bare', '--quiet', str(path)], check=True)
+    rng = random.Random(seed)
+
+    def write(out: BinaryIO) -> None:
+        writer = _Writer(out, spec, rng)
+        budget = spec.size
+        commits: List[int] = []
+        for i in range(spec.commits):
+            share = budget // (spec.commits - i)
+            commits.append(writer.commit('refs/heads/main', share,
+                                         f":{commits[-1]}" if commits else ''))
+            budget -= share
+        for i in range(spec.branches):
+            writer.commit(f"refs/heads/branch-{i}", spec.size // max(spec.commits, 1),
+                          f":{rng.choice(commits)}")
+        for i in range(min(spec.tags, len(commits))):
+            writer.tag(f"v{i + 1}.0", commits[(i + 1) * len(commits) // (spec.tags + 1)])
+
+    _fast_import(path, write)
+    subprocess.run(['git', '--git-dir', str(path), 'symbolic-ref', 'HEAD', 'refs/heads/main'],
+                   check=True)
+    # Served repositories are packed, as on GitHub
+    subprocess.run(['git', '--git-dir', str(path), 'repack', '-a', '-d', '-q'], check=True)
+
+def append_commits(path: Path, count: int, spec: RepoSpec, seed: Optional[int] = None) -> None:
+    """
+    Add count commits to main, as upstream activity between two mirror runs.
+
+    Without a seed the content is new on every call; the seed used to
+    generate the repository would recreate blobs it already has.
+    """
+    rng = random.Random(seed)
+
+    def write(out: BinaryIO) -> None:
+        writer = _Writer(out, spec, rng)
+        writer.time = EPOCH + 10 ** 8
+        parent = 'refs/heads/main^0'
+        for _ in range(count):
+            writer.commit('refs/heads/main', spec.size // max(spec.commits, 1), parent)
+            parent = ''
+
+    _fast_import(path, write)
+
+def generate_repos(root: Path, names: List[str], spec: RepoSpec, seed: int = 0) -> None:
+    """Generate root/owner/repo.git for every owner/repo name, each with its own content."""
+    for i, name in enumerate(names):
+        generate_repo(root / f"{name}.git", spec, seed + i)
+
+def repo_stats(path: Path) -> Tuple[int, int]:
+    """(bytes on disk, number of refs) of a repository."""
+    return dir_size(str(path)), len(read_refs(str(path)))
+
+class _GitHTTPHandler(BaseHTTPRequestHandler):
+    """Read-only smart HTTP through git http-backend (CGI)."""
+
+    def do_GET(self):
+        self._backend()
+
+    def do_POST(self):
+        self._backend()
+
+    def _body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';')[0], 16)
+            chunk = self.rfile.read(size)
+            self.rfile.readline()
+            if not size:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def _backend(self) -> None:
+        path, _, query = self.path.partition('?')
+        body = self._body()
+        env = {
+            'PATH': os.environ.get('PATH', ''),
+            'GIT_PROJECT_ROOT': self.server.root,
+            'GIT_HTTP_EXPORT_ALL': '1',
+            'PATH_INFO': unquote(path),
+            'QUERY_STRING': query,
+            'REQUEST_METHOD': self.command,
+            'CONTENT_TYPE': self.headers.get('Content-Type', ''),
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_CONTENT_ENCODING': self.headers.get('Content-Encoding', ''),
+            'GIT_PROTOCOL': self.headers.get('Git-Protocol', ''),
+            'REMOTE_ADDR': self.client_address[0],
+        }
+        result = subprocess.run(['git', 'http-backend'], input=body, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        head, _, payload = result.stdout.partition(b'\r\n\r\n')
+        status = 200
+        headers = []
+        for line in head.decode('latin-1').split('\r\n'):
+            name, _, value = line.partition(':')
+            if name.lower() == 'status':
+                status = int(value.split()[0])
+            elif name:
+                headers.append((name, value.strip()))
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+def serve_repos(root: Path, transport: str = 'file', port: int = 0) -> Tuple[str, Callable[[], None]]:
+    """
+    Serve the repositories below root.
+
+    Returns:
+        (base URL that owner/repo.git is appended to, function stopping the server)
+    """
+    root = root.resolve()
+    if transport == 'file':
+        return root.as_uri(), lambda: None
+    if transport == 'daemon':
+        if not port:
+            # git daemon cannot report the port it picked, so find a free one first
+            with socket.socket() as probe:
+                probe.bind(('127.0.0.1', 0))
+                port = probe.getsockname()[1]
+        daemon = subprocess.Popen(['git', 'daemon', '--reuseaddr', '--export-all',
+                                   '--listen=127.0.0.1', f"--port={port}",
+                                   f"--base-path={root}", str(root)],
+                                  stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+
+        def stop() -> None:
+            daemon.terminate()
+            daemon.wait()
+        return f"git://127.0.0.1:{port}", stop
+    if transport == 'http':
+        server = ThreadingHTTPServer(('127.0.0.1', port), _GitHTTPHandler)
+        server.daemon_threads = True
+        server.root = str(root)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{server.server_address[1]}", server.shutdown
+    raise ValueError(f"transport must be one of {', '.join(TRANSPORTS)}, not '{transport}'")
+
+def add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = RepoSpec()
+    parser.add_argument('--size', default='10M',
+                        help="blob content per repository, e.g. 200M (default 10M)")
+    parser.add_argument('--commits', type=int, default=defaults.commits,
+                        help=f"commits on main (default {defaults.commits})")
+    parser.add_argument('--branches', type=int, default=defaults.branches,
+                        help=f"branches besides main (default {defaults.branches})")
+    parser.add_argument('--tags', type=int, default=defaults.tags,
+                        help=f"annotated tags (default {defaults.tags})")
+    parser.add_argument('--blob-median', default='16K', help="median blob size (default 16K)")
+    parser.add_argument('--blob-sigma', type=float, default=defaults.blob_sigma,
+                        help=f"spread of the log-normal blob sizes (default {defaults.blob_sigma})")
+    parser.add_argument('--compressible', type=float, default=defaults.compressible,
+                        help=f"share of each blob that compresses (default {defaults.compressible})")
+
+def spec_from_args(args: argparse.Namespace) -> RepoSpec:
+    return RepoSpec(parse_size(args.size), args.commits, args.branches, args.tags,
+                    parse_size(args.blob_median), args.blob_sigma, args.compressible)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('root', help="directory the repositories are created in")
+    parser.add_argument('--count', type=int, default=4, help="repositories (default 4)")
+    parser.add_argument('--owner', default='synthetic', help="owner part of the names")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--serve', choices=TRANSPORTS, help="serve them until interrupted")
+    parser.add_argument('--port', type=int, default=0, help="port for --serve daemon or http")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    spec = spec_from_args(args)
+    root = Path(args.root)
+    names = [f"{args.owner}/repo{i:03d}" for i in range(args.count)]
+    generate_repos(root, names, spec, args.seed)
+    for name in names:
+        size, refs = repo_stats(root / f"{name}.git")
+        print(f"{name:<30} {size / 1024 ** 2:>8.1f} MB {refs:>6} refs")
+
+    if args.serve:
+        url, stop = serve_repos(root, args.serve, args.port)
+        print(f"Serving at {url}/<owner>/<repo>.git until interrupted")
+        print(f"export GITHUB_URL={url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+        stop()
+
+if __name__ == '__main__':
+    main()
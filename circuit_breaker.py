@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker protecting an overloaded server.
+
+While CLOSED every call goes through and its outcome is recorded in a
+sliding window. When the share of failures in the window reaches the
+configured rate, the breaker OPENs: callers block for a cooldown instead of
+piling more work on the server. After the cooldown it is HALF_OPEN and lets
+exactly one probe call through. A successful probe closes the breaker and
+the concurrency limit restarts at half its maximum, growing back one slot
+per run of healthy calls; a failed probe reopens it with a longer cooldown.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from concurrency import ConcurrencyLimit
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker with a failure-rate trigger."""
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window: int = 20,
+                 min_calls: int = 5, cooldown: float = 30.0, max_cooldown: float = 300.0,
+                 limit: Optional[ConcurrencyLimit] = None):
+        """
+        Args:
+            name: Protected service, used in messages
+            failure_rate: Share of failed calls in the window that opens the breaker
+            window: Number of recent calls considered
+            min_calls: Calls needed in the window before the breaker may open
+            cooldown: Seconds to stay open before probing
+            max_cooldown: Cap for the cooldown, which doubles after a failed probe
+            limit: Concurrency limit to reduce when recovering
+        """
+        self.name = name
+        self.window = window
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.limit = limit
+        self.state = CLOSED
+        self._cooldown = cooldown
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._results: deque = deque(maxlen=window)
+        self._healthy_streak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> bool:
+        """
+        Wait until a call may be made.
+
+        Returns:
+            True if this call is the half-open probe; pass it to record()
+        """
+        with self._cond:
+            while True:
+                if self.state == CLOSED:
+                    return False
+                if self.state == OPEN:
+                    remaining = self._opened_at + self._cooldown - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                    self.state = HALF_OPEN
+                    print(f"⚡ {self.name} circuit half-open, sending one probe")
+                if not self._probe_in_flight:
+                    self._probe_in_flight = True
+                    return True
+                self._cond.wait()
+
+    def record(self, ok: bool, probe: bool = False) -> None:
+        """Record the outcome of a call admitted by acquire()."""
+        with self._cond:
+            if probe:
+                self._probe_in_flight = False
+                if ok:
+                    self._close()
+                else:
+                    self._cooldown = min(self._cooldown * 2, self.max_cooldown)
+                    self._open("probe failed")
+                self._cond.notify_all()
+                return
+
+            if self.state != CLOSED:
+                # Stragglers admitted before the breaker opened
+                return
+            self._results.append(ok)
+            failures = self._results.count(False)
+            if (len(self._results) >= self.min_calls
+                    and failures / len(self._results) >= self.failure_rate):
+                self._open(f"{failures}/{len(self._results)} recent calls failed")
+                self._cond.notify_all()
+            elif ok:
+                self._recover()
+
+    def _open(self, reason: str) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._results.clear()
+        print(f"⚡ {self.name} circuit open ({reason}), pausing for {self._cooldown:.0f}s")
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._cooldown = self.base_cooldown
+        self._healthy_streak = 0
+        message = f"⚡ {self.name} circuit closed"
+        if self.limit is not None:
+            reduced = self.limit.set(max(1, self.limit.maximum // 2))
+            message += f", resuming at concurrency {reduced}/{self.limit.maximum}"
+        print(message)
+
+    def _recover(self) -> None:
+        """Grow a reduced concurrency limit back, one slot per healthy run."""
+        if self.limit is None or self.limit.limit >= self.limit.maximum:
+            return
+        self._healthy_streak += 1
+        if self._healthy_streak >= self.limit.limit:
+            self._healthy_streak = 0
+            self.limit.set(self.limit.limit + 1)
+
+    def describe(self) -> str:
+        return (f"opens at {self.failure_rate:.0%} errors over {self.window} calls, "
+                f"{self.base_cooldown:g}s cooldown")
+
+def breaker_from_env(name: str, limit: Optional[ConcurrencyLimit] = None) -> Optional[CircuitBreaker]:
+    """
+    Build a breaker from BREAKER_ERROR_RATE, BREAKER_WINDOW, BREAKER_MIN_CALLS
+    and BREAKER_COOLDOWN. An error rate of 0 disables the breaker.
+    """
+    failure_rate = float(os.getenv('BREAKER_ERROR_RATE', '0.5'))
+    if failure_rate <= 0:
+        return None
+    return CircuitBreaker(name, failure_rate,
+                          window=int(os.getenv('BREAKER_WINDOW', '20')),
+                          min_calls=int(os.getenv('BREAKER_MIN_CALLS', '5')),
+                          cooldown=float(os.getenv('BREAKER_COOLDOWN', '30')),
+                          limit=limit)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Adjustable concurrency limit shared by worker threads.
+
+Workers hold a slot for the duration of a request. The limit can be lowered
+or raised while the run is in progress (by the circuit breaker or the AIMD
+controller); lowering it never interrupts requests already in flight, it
+only holds back new ones until enough slots are released.
+"""
+
+import threading
+import time
+
+class ConcurrencyLimit:
+    """Counting semaphore whose size can change at runtime."""
+
+    def __init__(self, limit: int, maximum: int = 0):
+        """
+        Args:
+            limit: Initial number of slots
+            maximum: Upper bound for the limit (default: the initial limit)
+        """
+        self.maximum = max(1, maximum or limit)
+        self._limit = min(max(1, limit), self.maximum)
+        self._active = 0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._active
+
+    def set(self, limit: int) -> int:
+        """Change the limit, clamped to [1, maximum]. Returns the new limit."""
+        with self._cond:
+            self._limit = min(max(1, int(limit)), self.maximum)
+            self._cond.notify_all()
+            return self._limit
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._active >= self._limit:
+                self._cond.wait()
+            self._active += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def __enter__(self) -> 'ConcurrencyLimit':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+class AIMDController:
+    """
+    Additive-increase / multiplicative-decrease tuning of a ConcurrencyLimit.
+
+    Every healthy request (answered in time, no error) adds 1/limit to the
+    limit, so it grows by one slot per round of requests. A failure (timeout,
+    5xx, connection error) multiplies it by `decrease`; requests that were
+    already in flight when the limit was cut do not cut it again. Slow but
+    successful answers hold the limit where it is.
+    """
+
+    def __init__(self, limit: ConcurrencyLimit, target_latency: float,
+                 decrease: float = 0.5):
+        """
+        Args:
+            limit: The limit to adjust
+            target_latency: Seconds above which an answer counts as slow
+            decrease: Factor applied to the limit on failure
+        """
+        self.limit = limit
+        self.target_latency = target_latency
+        self.decrease = decrease
+        self._credit = 0.0
+        self._last_cut = float('-inf')
+        self._lock = threading.Lock()
+
+    def observe(self, started: float, ok: bool) -> None:
+        """
+        Record a finished request.
+
+        Args:
+            started: time.monotonic() when the request was sent
+            ok: False if the request failed in a way that signals overload
+        """
+        latency = time.monotonic() - started
+        with self._lock:
+            current = self.limit.limit
+            if not ok:
+                if started < self._last_cut:
+                    return
+                self._last_cut = time.monotonic()
+                self._credit = 0.0
+                self._change(current, int(current * self.decrease))
+            elif latency <= self.target_latency:
+                self._credit += 1.0 / current
+                if self._credit >= 1.0:
+                    self._credit = 0.0
+                    self._change(current, current + 1)
+
+    def _change(self, current: int, wanted: int) -> None:
+        new = self.limit.set(wanted)
+        if new != current:
+            print(f"⇅ Concurrency {current} → {new} (max {self.limit.maximum})")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Thread-safe console output.
+
+print() writes the text and the line ending as two separate calls, so lines
+printed by concurrent workers can end up glued together. The writer
+installed here buffers each thread's output until a newline and then writes
+whole lines under a lock.
+
+On a terminal, a status line (see progress.py) can be kept at the bottom:
+it is erased before other output is written and redrawn after it.
+"""
+
+import sys
+import threading
+from typing import Dict, Optional, TextIO
+
+_lock = threading.Lock()
+_status = ''
+_status_stream: Optional[TextIO] = None
+CLEAR_LINE = '\r\x1b[K'
+
+class LineWriter:
+    """Wraps a text stream and emits complete lines atomically."""
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self._pending: Dict[int, str] = {}
+
+    def write(self, text: str) -> int:
+        thread = threading.get_ident()
+        with _lock:
+            buffered = self._pending.pop(thread, '') + text
+            head, newline, tail = buffered.rpartition('\n')
+            if newline:
+                if _status:
+                    _status_stream.write(CLEAR_LINE)
+                    _status_stream.flush()
+                self.stream.write(head + newline)
+                self.stream.flush()
+                if _status:
+                    _status_stream.write(_status)
+                    _status_stream.flush()
+            if tail:
+                self._pending[thread] = tail
+        return len(text)
+
+    def flush(self) -> None:
+        with _lock:
+            # Partial lines (e.g. prompts) are released on explicit flush
+            pending = self._pending.pop(threading.get_ident(), '')
+            if pending:
+                self.stream.write(pending)
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def install() -> None:
+    """Route sys.stdout and sys.stderr through line writers (idempotent)."""
+    if not isinstance(sys.stdout, LineWriter):
+        sys.stdout = LineWriter(sys.stdout)
+    if not isinstance(sys.stderr, LineWriter):
+        sys.stderr = LineWriter(sys.stderr)
+
+def status_supported() -> bool:
+    """True if stdout is a terminal that can hold a status line."""
+    stream = getattr(sys.stdout, 'stream', sys.stdout)
+    return hasattr(stream, 'isatty') and stream.isatty()
+
+def set_status(text: str) -> None:
+    """Show text on the bottom line of the terminal (empty to remove it)."""
+    global _status, _status_stream
+    with _lock:
+        if _status_stream is None:
+            _status_stream = getattr(sys.stdout, 'stream', sys.stdout)
+        _status_stream.write(CLEAR_LINE + text)
+        _status_stream.flush()
+        _status = text
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Admission control for scratch disk space.
+
+Before a repository is cloned, its estimated size is reserved against the
+budget; a clone that would not fit waits until earlier repositories are
+cleaned up. Once the clone is on disk the reservation is corrected to the
+size it actually takes, so overestimates do not hold back other clones.
+
+A repository bigger than the whole budget is still admitted, but only when
+nothing else is reserved, so it can never wait forever.
+"""
+
+import threading
+import time
+from typing import Dict
+
+class DiskBudget:
+    """Thread-safe byte budget shared by concurrent clones."""
+
+    def __init__(self, budget_bytes: int):
+        """
+        Args:
+            budget_bytes: Bytes that may be reserved at once (0 = unbounded)
+        """
+        self.budget = budget_bytes
+        self._reserved: Dict[str, int] = {}
+        self._cond = threading.Condition()
+
+    @property
+    def used(self) -> int:
+        with self._cond:
+            return sum(self._reserved.values())
+
+    def reserve(self, name: str, size: int) -> float:
+        """
+        Reserve space for a repository, blocking until it fits.
+
+        Returns:
+            Seconds spent waiting
+        """
+        started = time.monotonic()
+        with self._cond:
+            while (self.budget and self._reserved
+                   and sum(self._reserved.values()) + size > self.budget):
+                self._cond.wait()
+            self._reserved[name] = size
+        return time.monotonic() - started
+
+    def adjust(self, name: str, size: int) -> None:
+        """Replace a reservation with the size actually used on disk."""
+        with self._cond:
+            if name in self._reserved:
+                self._reserved[name] = size
+                self._cond.notify_all()
+
+    def release(self, name: str) -> None:
+        with self._cond:
+            if self._reserved.pop(name, None) is not None:
+                self._cond.notify_all()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Small helpers around the Forgejo REST API.
+"""
+
+from typing import Any, Dict, Optional
+
+import http_client
+
+def api_url(forgejo_url: str, path: str) -> str:
+    """Build an absolute /api/v1 URL."""
+    return f"{forgejo_url.rstrip('/')}/api/v1/{path.lstrip('/')}"
+
+def current_user(forgejo_url: str, forgejo_token: str) -> str:
+    """Return the login of the user owning the token."""
+    session = http_client.forgejo_session(forgejo_token)
+    response = session.get(api_url(forgejo_url, 'user'), timeout=30)
+    response.raise_for_status()
+    return response.json()['login']
+
+def mirror_description(full_name: str, description: str = '') -> str:
+    """
+    Description for a repository created to mirror GitHub's full_name. It
+    marks the repository as that mirror, see is_mirror_of().
+    """
+    marker = f"Mirrored from {full_name}"
+    return f"{description} ({marker})" if description else marker
+
+def is_mirror_of(repo: Dict[str, Any], full_name: str) -> bool:
+    """Whether a repository was created to mirror GitHub's full_name."""
+    description = repo.get('description') or ''
+    marker = f"Mirrored from {full_name}"
+    return description == marker or description.endswith(f" ({marker})")
+
+def get_repo(forgejo_url: str, forgejo_token: str, owner: str,
+             name: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch a repository.
+
+    Returns:
+        The repository object, or None if it does not exist
+
+    Raises:
+        requests.exceptions.RequestException on network or server errors
+    """
+    session = http_client.forgejo_session(forgejo_token)
+    response = session.get(api_url(forgejo_url, f'repos/{owner}/{name}'), timeout=30)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+def list_owner_repos(forgejo_url: str, forgejo_token: str, owner: str,
+                     page_size: int = 50) -> Dict[str, Dict[str, Any]]:
+    """
+    List every repository of a user or organization, one page at a time.
+
+    Args:
+        owner: User or organization login
+        page_size: Repositories per request (Forgejo caps this at 50 by default)
+
+    Returns:
+        Mapping of lower-cased repository name to repository object
+
+    Raises:
+        requests.exceptions.RequestException on network or server errors
+    """
+    session = http_client.forgejo_session(forgejo_token)
+    repos: Dict[str, Dict[str, Any]] = {}
+    # Organizations and users have separate endpoints; try the organization first
+    endpoint = api_url(forgejo_url, f'orgs/{owner}/repos')
+    page = 1
+    while True:
+        response = session.get(endpoint, params={'page': page, 'limit': page_size}, timeout=30)
+        if response.status_code == 404 and page == 1 and '/orgs/' in endpoint:
+            endpoint = api_url(forgejo_url, f'users/{owner}/repos')
+            continue
+        response.raise_for_status()
+        batch = response.json()
+        for repo in batch:
+            repos[repo['name'].lower()] = repo
+        # The server may return fewer items per page than asked for (its
+        # MAX_RESPONSE_ITEMS setting), so a short page is not necessarily the last
+        total = response.headers.get('X-Total-Count', '')
+        if not batch or (total.isdigit() and len(repos) >= int(total)):
+            return repos
+        page += 1
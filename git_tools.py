@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Thin wrappers around the git command line.
+"""
+
+import subprocess
+from typing import Callable, List, Optional, TypeVar
+
+from retry import RetryableError, classify_git_error, retry_call
+
+T = TypeVar('T')
+
+def run_git(args: List[str], cwd: Optional[str] = None) -> subprocess.CompletedProcess:
+    """Run git quietly, raising CalledProcessError with stderr captured."""
+    return subprocess.run(['git'] + args, cwd=cwd, check=True,
+                          capture_output=True, text=True)
+
+def git_error(e: subprocess.CalledProcessError) -> str:
+    """
+    The message git printed for a failure, without the command line
+    (which may hold a token). Prefers the first fatal:/error: line.
+    """
+    lines = (e.stderr or '').strip().splitlines()
+    for line in lines:
+        if line.startswith(('fatal:', 'error:')):
+            return line
+    return lines[-1] if lines else f"git exited with status {e.returncode}"
+
+def retry_git(func: Callable[[], T], what: str) -> T:
+    """
+    Call func, which runs git, retrying transient git failures with backoff.
+
+    Args:
+        func: Runs one attempt; must be safe to repeat
+        what: Description used in retry messages, e.g. "cloning owner/repo"
+
+    Raises:
+        RetryableError once the failure is permanent or retries are exhausted
+    """
+    def attempt(_: int) -> T:
+        try:
+            return func()
+        except subprocess.CalledProcessError as e:
+            raise RetryableError(classify_git_error(e.stderr or ''), git_error(e)) from e
+
+    def on_retry(error: RetryableError, attempt_number: int, delay: float) -> None:
+        print(f"Retrying {what} in {delay:.0f}s after: {error.message}")
+
+    return retry_call(attempt, on_retry)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+On-disk cache for conditional GET requests.
+
+Responses carrying an ETag or Last-Modified header are stored, keyed by
+URL, Accept header and a hash of the credentials used. The next request for
+the same key sends If-None-Match / If-Modified-Since; on 304 Not Modified
+the stored body is returned. GitHub does not count 304 responses against
+the rate limit, so repeated runs cost almost nothing.
+
+Enabled by setting HTTP_CACHE_DIR.
+"""
+
+import base64
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Headers describing the wire encoding of a 304, not of the cached body
+_TRANSPORT_HEADERS = {'content-length', 'content-encoding', 'transfer-encoding'}
+
+class ResponseCache:
+    """Directory of cached GET responses validated with ETag/Last-Modified."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _key(url: str, accept: str, authorization: str) -> str:
+        # The token itself never reaches the disk, only its hash
+        identity = hashlib.sha256(authorization.encode()).hexdigest()
+        return hashlib.sha256(f"{identity}\n{accept}\n{url}".encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key: str, response: requests.Response) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            'url': response.url,
+            'headers': dict(response.headers),
+            'body': base64.b64encode(response.content).decode('ascii'),
+        }
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _replay(entry: Dict[str, Any], not_modified: requests.Response) -> requests.Response:
+        """Turn a 304 into the cached 200 it stands for."""
+        headers = CaseInsensitiveDict(entry['headers'])
+        # Keep fresh rate-limit and date headers from the 304 itself
+        for name, value in not_modified.headers.items():
+            if name.lower() not in _TRANSPORT_HEADERS:
+                headers[name] = value
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK (cached)'
+        response.headers = headers
+        response._content = base64.b64decode(entry['body'])
+        response.url = entry['url']
+        response.request = not_modified.request
+        response.encoding = requests.utils.get_encoding_from_headers(headers) or 'utf-8'
+        response.from_cache = True
+        return response
+
+    def get(self, session: requests.Session, url: str, params: Optional[Dict[str, Any]] = None,
+            headers: Optional[Dict[str, str]] = None, **kwargs: Any) -> requests.Response:
+        """session.get() with conditional headers and cache replay on 304."""
+        headers = dict(headers or {})
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        accept = headers.get('Accept') or session.headers.get('Accept', '')
+        key = self._key(full_url, accept, session.headers.get('Authorization', ''))
+
+        entry = self._load(key)
+        if entry is not None:
+            stored = CaseInsensitiveDict(entry['headers'])
+            if 'ETag' in stored:
+                headers['If-None-Match'] = stored['ETag']
+            if 'Last-Modified' in stored:
+                headers['If-Modified-Since'] = stored['Last-Modified']
+
+        response = session.get(full_url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            return self._replay(entry, response)
+        if response.status_code == 200 and ('ETag' in response.headers
+                                            or 'Last-Modified' in response.headers):
+            self._store(key, response)
+        return response
+
+_default_cache: Optional[ResponseCache] = None
+
+def default_cache() -> Optional[ResponseCache]:
+    """The cache configured by HTTP_CACHE_DIR, or None when caching is off."""
+    global _default_cache
+    directory = os.getenv('HTTP_CACHE_DIR')
+    if directory and (_default_cache is None or _default_cache.directory != directory):
+        _default_cache = ResponseCache(directory)
+    return _default_cache if directory else None
+
+def cached_get(session: requests.Session, url: str, **kwargs: Any) -> requests.Response:
+    """GET through the default cache when it is enabled, plainly otherwise."""
+    cache = default_cache()
+    if cache is None:
+        return session.get(url, **kwargs)
+    return cache.get(session, url, **kwargs)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP sessions shared by the migration and export scripts.
+
+Every Forgejo and GitHub call goes through a requests.Session created here,
+so TCP/TLS connections are kept alive and reused between repositories and
+the default headers are built once per token instead of once per request.
+"""
+
+import os
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from rate_limit import RateLimitScheduler
+
+USER_AGENT = os.getenv('USER_AGENT', 'munchiehub-fav-exporter')
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com')
+GITHUB_API_VERSION = os.getenv('API_VERSION', '2022-11-28')
+DEFAULT_POOL_SIZE = 10
+# How many times a request rejected by a rate limit is resent after the pause
+RATE_LIMIT_RETRIES = int(os.getenv('RATE_LIMIT_RETRIES', '3'))
+
+_pool_size = DEFAULT_POOL_SIZE
+_sessions: Dict[Tuple[str, Optional[str]], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+def set_pool_size(size: int) -> None:
+    """
+    Set the connection pool size used for sessions created afterwards.
+    Call this with the worker concurrency before the first request.
+    """
+    global _pool_size
+    _pool_size = max(1, size)
+
+def github_resource(url: str) -> str:
+    """GitHub rate-limit resource a request URL is counted against."""
+    path = urlparse(url).path
+    if path.endswith('/graphql'):
+        return 'graphql'
+    if '/search/' in path:
+        return 'search'
+    return 'core'
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that waits for the scheduler before sending, feeds it the
+    rate-limit headers of every response, and resends requests rejected by
+    a rate limit once the pause is over.
+    """
+
+    def __init__(self, scheduler: RateLimitScheduler, **kwargs):
+        self.scheduler = scheduler
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        resource = github_resource(request.url)
+        # Querying the budget is free and must not wait for it
+        free = urlparse(request.url).path.endswith('/rate_limit')
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            if not free:
+                self.scheduler.wait(resource)
+            response = super().send(request, **kwargs)
+            text = response.text if response.status_code in (403, 429) else ''
+            if not self.scheduler.observe(response.headers, response.status_code, text):
+                return response
+            if attempt < RATE_LIMIT_RETRIES:
+                response.close()
+        return response
+
+def _record_metrics(service: str):
+    """Response hook feeding request latency and GitHub's budget to metrics."""
+    def hook(response, *args, **kwargs):
+        metrics.REQUEST_SECONDS.observe(response.elapsed.total_seconds(), service=service,
+                                        status=str(response.status_code))
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining is not None and remaining.isdigit():
+            metrics.RATE_LIMIT_REMAINING.set(
+                int(remaining), resource=response.headers.get('X-RateLimit-Resource', 'core'))
+    return hook
+
+def build_session(headers: Dict[str, str], pool_size: Optional[int] = None,
+                  scheduler: Optional[RateLimitScheduler] = None,
+                  service: str = 'http') -> requests.Session:
+    """
+    Create a keep-alive session with default headers and a sized pool,
+    optionally paced by a rate-limit scheduler. Responses are recorded in
+    the metrics under the given service name.
+    """
+    size = pool_size or _pool_size
+    session = requests.Session()
+    if scheduler is not None:
+        adapter = RateLimitedAdapter(scheduler, pool_connections=size, pool_maxsize=size)
+        session.rate_limit = scheduler
+    else:
+        adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(headers)
+    session.hooks['response'].append(_record_metrics(service))
+    return session
+
+def _shared(kind: str, token: Optional[str], headers: Dict[str, str],
+            scheduler: Optional[RateLimitScheduler] = None) -> requests.Session:
+    key = (kind, token)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = build_session(headers, scheduler=scheduler, service=kind)
+        return session
+
+def forgejo_session(token: str) -> requests.Session:
+    """Shared session authenticated against the Forgejo API."""
+    return _shared('forgejo', token, {
+        'Authorization': f'token {token}',
+        'Content-Type': 'application/json',
+        'User-Agent': USER_AGENT,
+    })
+
+def github_session(token: Optional[str] = None) -> requests.Session:
+    """
+    Shared session for the GitHub API, anonymous if no token is given.
+    Requests are paced by the rate-limit budget GitHub reports for the token
+    (available as session.rate_limit).
+    """
+    headers = {
+        'Accept': 'application/vnd.github+json',
+        'X-GitHub-Api-Version': GITHUB_API_VERSION,
+        'User-Agent': USER_AGENT,
+    }
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    return _shared('github', token, headers, RateLimitScheduler())
+
+def refresh_github_rate_limit(token: Optional[str] = None) -> RateLimitScheduler:
+    """
+    Load the current budget of a token from GET /rate_limit, which does not
+    count against it, and return the scheduler tracking it.
+    """
+    session = github_session(token)
+    response = session.get(f"{GITHUB_API_URL}/rate_limit", timeout=30)
+    if response.status_code == 200:
+        for resource, budget in response.json().get('resources', {}).items():
+            session.rate_limit.update(resource, budget['remaining'], budget['limit'],
+                                      budget['reset'])
+    return session.rate_limit
+
+def close_all() -> None:
+    """Close every shared session and drop its pooled connections."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Append-only journal of migration outcomes.
+
+Every settled repository is appended as one JSON line and fsync'd before
+the next one is written, so an interrupted run loses at most the line being
+written. A later run reads the journal back and skips repositories whose
+last recorded outcome is a success.
+
+Each entry names its target (the Forgejo instance and owner), and only the
+entries of the current target are read back: a repository migrated to one
+Forgejo is not done on another.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+class MigrationJournal:
+    """JSON-lines journal, safe to record into from several threads."""
+
+    def __init__(self, path: str, target: str = ''):
+        """
+        Args:
+            path: Journal file
+            target: Where the migrations go, e.g. Forgejo URL and owner
+        """
+        self.path = path
+        self.target = target
+        self._lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> Dict[str, str]:
+        """
+        Read the journal.
+
+        Returns:
+            Mapping of repository to its most recent outcome for this target
+        """
+        outcomes: Dict[str, str] = {}
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        if entry.get('target', '') == self.target:
+                            outcomes[entry['repo']] = entry['outcome']
+                    except (ValueError, KeyError, TypeError):
+                        # A line torn by a crash mid-write
+                        continue
+        except FileNotFoundError:
+            pass
+        return outcomes
+
+    def record(self, repo: str, outcome: str, **details) -> None:
+        """Append an outcome and force it to disk."""
+        entry = {'repo': repo, 'outcome': outcome, 'target': self.target,
+                 'time': time.time(), **details}
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = self._open()
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _open(self):
+        f = open(self.path, 'a+b')
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                # End the line torn by a crash, or the next entry would be lost with it
+                f.write(b'\n')
+        f.close()
+        return open(self.path, 'a')
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def completed(outcomes: Dict[str, str], done: Iterable[str]) -> set:
+    """Repositories whose last journaled outcome is one of `done`."""
+    done = set(done)
+    return {repo for repo, outcome in outcomes.items() if outcome in done}
+
+def journal_from_env(default: str = 'migration-journal.jsonl') -> Optional[MigrationJournal]:
+    """Journal at JOURNAL_FILE (an empty value disables journaling)."""
+    path = os.getenv('JOURNAL_FILE', default)
+    return MigrationJournal(path) if path else None
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics for migration and export runs.
+
+Metrics are kept in memory and exposed in the Prometheus text format, either
+as a node_exporter textfile (METRICS_FILE, rewritten atomically every
+METRICS_INTERVAL seconds and at the end of the run) or over HTTP while the
+run lasts (METRICS_PORT). Without either, recording is a no-op apart from
+the bookkeeping.
+
+Every sample carries a `script` label naming the program that produced it,
+so several cron jobs can share a textfile directory.
+"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in key)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + '}'
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, func: Callable[[], float], **labels: str) -> None:
+        """Read the value from func whenever the metrics are rendered."""
+        with self._lock:
+            self._functions[_key(labels)] = func
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, func in functions.items():
+            values[key] = func()
+        return [(self.name, key, value) for key, value in values.items()]
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> (bucket counts, sum, count)
+        self._series: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _key(labels)
+        with self._lock:
+            counts, total, count = self._series.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._series[key] = (counts, total + value, count + 1)
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        out = []
+        with self._lock:
+            series = {key: (list(counts), total, count)
+                      for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in series.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                out.append((f"{self.name}_bucket", key + (('le', f"{bound:g}"),), bucket_count))
+            out.append((f"{self.name}_bucket", key + (('le', '+Inf'),), count))
+            out.append((f"{self.name}_sum", key, total))
+            out.append((f"{self.name}_count", key, count))
+        return out
+
+class Registry:
+    """A set of metrics with labels common to all of them."""
+
+    def __init__(self):
+        self.common_labels: Dict[str, str] = {}
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        common = _key(self.common_labels)
+        lines = []
+        for metric in self._metrics:
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in samples:
+                lines.append(f"{name}{_format_labels(common + key)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str) -> None:
+        """Write the metrics so node_exporter never reads a partial file."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+registry = Registry()
+
+REPOS = registry.register(Counter(
+    'munchiehub_repos_total', 'Repositories processed, by outcome'))
+GIT_BYTES = registry.register(Counter(
+    'munchiehub_git_bytes_total', 'Bytes of git data cloned or pushed'))
+REQUEST_SECONDS = registry.register(Histogram(
+    'munchiehub_request_duration_seconds', 'HTTP request latency by service and status'))
+RATE_LIMIT_REMAINING = registry.register(Gauge(
+    'munchiehub_github_rate_limit_remaining', 'GitHub requests left in the current window'))
+IN_FLIGHT = registry.register(Gauge(
+    'munchiehub_in_flight', 'Repositories being worked on right now'))
+CONCURRENCY_LIMIT = registry.register(Gauge(
+    'munchiehub_concurrency_limit', 'Current limit of concurrent submissions'))
+STARRED = registry.register(Gauge(
+    'munchiehub_starred_repos', 'Starred repositories in the last export'))
+RUN_START = registry.register(Gauge(
+    'munchiehub_run_start_timestamp_seconds', 'When the run started'))
+RUN_END = registry.register(Gauge(
+    'munchiehub_run_end_timestamp_seconds', 'When the run finished'))
+RUN_SUCCESS = registry.register(Gauge(
+    'munchiehub_run_success', '1 if the last run finished without failures'))
+
+_path: Optional[str] = None
+_stop = threading.Event()
+_server: Optional[ThreadingHTTPServer] = None
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def _write_periodically(interval: float) -> None:
+    while not _stop.wait(interval):
+        registry.write_textfile(_path)
+
+def start(script: str) -> None:
+    """Start exporting as configured by METRICS_FILE / METRICS_PORT."""
+    global _path, _server
+    registry.common_labels['script'] = script
+    RUN_START.set(time.time())
+    _path = os.getenv('METRICS_FILE') or None
+    if _path:
+        interval = float(os.getenv('METRICS_INTERVAL', '15'))
+        threading.Thread(target=_write_periodically, args=(interval,), daemon=True).start()
+    port = os.getenv('METRICS_PORT')
+    if port:
+        address = os.getenv('METRICS_ADDR', '127.0.0.1')
+        _server = ThreadingHTTPServer((address, int(port)), _Handler)
+        threading.Thread(target=_server.serve_forever, daemon=True).start()
+
+def finish(success: bool = True) -> None:
+    """Write the final textfile and stop the HTTP server."""
+    RUN_END.set(time.time())
+    RUN_SUCCESS.set(1 if success else 0)
+    _stop.set()
+    if _path:
+        registry.write_textfile(_path)
+    if _server is not None:
+        _server.shutdown()
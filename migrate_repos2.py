@@ -6,9 +6,27 @@ Migrates only code and releases to avoid timeouts.
 
 import os
 import sys
-import requests
+import threading
 import time
-from typing import List, Tuple, Optional
+import requests
+from contextlib import nullcontext
+from typing import Dict, List, Tuple, Optional
+
+import console
+import forgejo_api
+import http_client
+import metrics
+import progress
+import rate_limit
+import retry
+import scheduling
+import timing
+from circuit_breaker import CircuitBreaker, breaker_from_env
+from concurrency import AIMDController, ConcurrencyLimit
+from journal import completed, journal_from_env
+from migration_engine import (EXISTS, FAILED, PENDING, SUCCESS, UNCONFIRMED,
+                              count_outcomes, run_migrations)
+from retry import RetryableError, retry_call
 
 def check_environment() -> Tuple[str, str, Optional[str]]:
     """Check for required environment variables and exit if missing."""
@@ -28,12 +46,16 @@ def check_environment() -> Tuple[str, str, Optional[str]]:
     
     return forgejo_url, forgejo_token, github_token
 
-def read_repos_from_file(filename: str) -> List[str]:
-    """Read repository names from text file."""
+def read_repos_from_file(filename: str) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Read repository names, and sizes where given, from text file.
+    
+    Returns:
+        (repository names, size in bytes per repository)
+    """
     try:
         with open(filename, 'r') as f:
-            repos = [line.strip() for line in f if line.strip() and not line.startswith('#')]
-        return repos
+            return scheduling.parse_repo_list(f)
     except FileNotFoundError:
         print(f"Error: File '{filename}' not found", file=sys.stderr)
         sys.exit(1)
@@ -41,9 +63,53 @@ def read_repos_from_file(filename: str) -> List[str]:
         print(f"Error reading file: {e}", file=sys.stderr)
         sys.exit(1)
 
+# Web address Forgejo clones repositories from
+GITHUB_URL = os.getenv('GITHUB_URL', 'https://github.com').rstrip('/')
+
+# Seconds between two GET /rate_limit calls while migrating
+BUDGET_REFRESH_SECONDS = 60
+_budget_checked = 0.0
+_budget_lock = threading.Lock()
+
+def wait_for_github_budget(github_token: Optional[str], force_refresh: bool = False) -> None:
+    """
+    Block while the GitHub budget of the token Forgejo migrates with is low.
+    
+    Forgejo spends our GitHub token without showing us the rate-limit
+    headers, so the budget is read from GET /rate_limit (which is free)
+    at most every BUDGET_REFRESH_SECONDS.
+    """
+    global _budget_checked
+    if not github_token:
+        return
+    with _budget_lock:
+        now = time.monotonic()
+        refresh = force_refresh or now - _budget_checked >= BUDGET_REFRESH_SECONDS
+        if refresh:
+            _budget_checked = now
+    if refresh:
+        try:
+            http_client.refresh_github_rate_limit(github_token)
+        except requests.exceptions.RequestException:
+            pass
+    http_client.github_session(github_token).rate_limit.wait('core')
+
+def github_rate_limited(github_token: str) -> None:
+    """Forgejo reported a GitHub rate limit: pause until it is lifted."""
+    wait_for_github_budget(github_token, force_refresh=True)
+    scheduler = http_client.github_session(github_token).rate_limit
+    if (scheduler.remaining('core') or 0) > 0:
+        # Secondary rate limit: the primary budget looks fine, back off a minute
+        scheduler.pause('core', 60)
+        scheduler.wait('core')
+
 def migrate_repository(forgejo_url: str, forgejo_token: str, github_repo: str,
                        github_token: Optional[str] = None, owner: str = None, 
-                       mirror: bool = False) -> bool:
+                       mirror: bool = False, prefix: str = "",
+                       submit_timeout: float = 120, track: bool = False,
+                       breaker: Optional[CircuitBreaker] = None,
+                       limit: Optional[ConcurrencyLimit] = None,
+                       controller: Optional[AIMDController] = None) -> str:
     """
     Migrate a single repository from GitHub to Forgejo (lightweight mode).
     Only migrates code and releases - skips issues, PRs, wiki, etc.
@@ -55,9 +121,16 @@ def migrate_repository(forgejo_url: str, forgejo_token: str, github_repo: str,
         github_token: GitHub personal access token
         owner: Forgejo owner/organization
         mirror: Whether to create a mirror
+        prefix: Text printed before the result line, e.g. "[3/120] "
+        submit_timeout: Seconds to wait for Forgejo to answer the submission
+        track: Report a submission timeout as PENDING instead of a failure,
+               so the caller can poll for the migration finishing in the background
+        breaker: Circuit breaker guarding Forgejo; submissions wait while it is open
+        limit: Concurrency limit for submissions in flight
+        controller: Adapts the limit to the latency and errors of submissions
     
     Returns:
-        True if successful, False otherwise
+        SUCCESS, EXISTS, PENDING or FAILED
     """
     api_endpoint = f"{forgejo_url.rstrip('/')}/api/v1/repos/migrate"
     
@@ -66,9 +139,9 @@ def migrate_repository(forgejo_url: str, forgejo_token: str, github_repo: str,
         github_owner, repo_name = github_repo.split('/')
     except ValueError:
         print(f"Error: Invalid repo format '{github_repo}'. Expected 'owner/repo'", file=sys.stderr)
-        return False
+        return FAILED
     
-    github_url = f"https://github.com/{github_repo}"
+    github_url = f"{GITHUB_URL}/{github_repo}"
     
     # Lightweight migration payload - only code and releases
     payload = {
@@ -95,49 +168,159 @@ def migrate_repository(forgejo_url: str, forgejo_token: str, github_repo: str,
     if owner:
         payload["repo_owner"] = owner
     
-    headers = {
-        "Authorization": f"token {forgejo_token}",
-        "Content-Type": "application/json"
-    }
+    # Several migrations run at once, so each result is printed as one line
+    label = f"{prefix}Migrating {github_repo}..."
     
-    try:
-        print(f"Migrating {github_repo}...", end=" ", flush=True)
-        response = requests.post(api_endpoint, json=payload, headers=headers, timeout=120)
+    session = http_client.forgejo_session(forgejo_token)
+    
+    def attempt_migration(attempt: int) -> str:
+        waiting = time.monotonic()
+        # Forgejo pulls from GitHub on our behalf, so both services are paced
+        wait_for_github_budget(github_token)
+        rate_limit.limiter('forgejo').acquire()
+        rate_limit.limiter('github').acquire()
+        probe = breaker.acquire() if breaker is not None else False
+        
+        started = time.monotonic()
+        
+        def report(healthy: bool) -> None:
+            timing.record(github_repo, 'request', time.monotonic() - started, healthy)
+            if breaker is not None:
+                breaker.record(healthy, probe)
+            if controller is not None:
+                controller.observe(started, healthy)
+        
+        try:
+            with limit if limit is not None else nullcontext():
+                started = time.monotonic()
+                timing.record(github_repo, 'wait', started - waiting)
+                response = session.post(api_endpoint, json=payload, timeout=submit_timeout)
+        except requests.exceptions.ReadTimeout:
+            # Forgejo keeps migrating after the client stops waiting. Tracked
+            # or not, the migration now loads the server beyond the submission,
+            # so it is no healthy sample for the breaker and the controller
+            report(False)
+            if track:
+                print(f"{label} ⧗ Submitted, tracking in background")
+                return PENDING
+            # Not retried: Forgejo is still migrating the first submission, so
+            # a retry would get 409 and report success whatever becomes of it
+            raise RetryableError(retry.PERMANENT, "Timeout")
+        except requests.exceptions.RequestException as e:
+            report(False)
+            error_class = retry.classify_request_exception(e)
+            kind = "Timeout" if error_class == retry.TIMEOUT else f"Network error: {e}"
+            raise RetryableError(error_class, kind)
+        
+        # Forgejo relays GitHub rate limits as errors; those say nothing about its health
+        overloaded = response.status_code == 429 or response.status_code >= 500
+        report(not overloaded or "rate limit" in response.text.lower())
         
         if response.status_code in (200, 201):
-            print("✓ Success")
-            return True
+            print(f"{label} ✓ Success")
+            return SUCCESS
         elif response.status_code == 409:
-            print("⚠ Already exists")
-            return True
-        else:
-            print(f"✗ Failed (HTTP {response.status_code})")
-            try:
-                error_data = response.json()
-                error_msg = error_data.get('message', 'Unknown error')
-                print(f"  Error: {error_msg}", file=sys.stderr)
-                
-                if "rate limit" in error_msg.lower():
-                    print("  Hint: Set GITHUB_TOKEN environment variable", file=sys.stderr)
-            except:
-                print(f"  Response: {response.text}", file=sys.stderr)
-            return False
-            
-    except requests.exceptions.Timeout:
-        print("✗ Timeout", file=sys.stderr)
-        return False
+            print(f"{label} ⚠ Already exists")
+            return EXISTS
+        
+        try:
+            error_msg = response.json().get('message', 'Unknown error')
+            details = f"  Error: {error_msg}"
+        except (ValueError, AttributeError):
+            error_msg = ''
+            details = f"  Response: {response.text}"
+        
+        if "rate limit" in error_msg.lower():
+            if github_token:
+                github_rate_limited(github_token)
+                raise RetryableError(retry.RATE_LIMITED, "GitHub rate limit reached")
+            details += "\n  Hint: Set GITHUB_TOKEN environment variable"
+        raise RetryableError(retry.classify_status(response.status_code),
+                             f"Failed (HTTP {response.status_code})\n{details}")
+    
+    def on_retry(error: RetryableError, attempt: int, delay: float) -> None:
+        reason = error.message.splitlines()[0]
+        print(f"{label} ↻ {reason}, retrying in {delay:.0f}s (attempt {attempt + 1})")
+        timing.record(github_repo, 'backoff', delay)
+    
+    try:
+        return retry_call(attempt_migration, on_retry)
+    except RetryableError as e:
+        summary, _, details = e.message.partition('\n')
+        print(f"{label} ✗ {summary}")
+        if details:
+            print(details, file=sys.stderr)
+        return FAILED
+
+def check_migration(forgejo_url: str, forgejo_token: str, owner: str,
+                    github_repo: str, prefix: str = "") -> str:
+    """
+    Check once whether a migration submitted in the background has finished.
+    
+    Forgejo creates the repository as soon as the migration starts and fills
+    it when the clone completes, so a non-empty repository means done.
+    
+    Returns:
+        SUCCESS once the repository has content, PENDING otherwise
+    """
+    repo_name = github_repo.split('/')[1]
+    try:
+        repo = forgejo_api.get_repo(forgejo_url, forgejo_token, owner, repo_name)
+    except requests.exceptions.RequestException:
+        # Transient; the next poll will tell
+        return PENDING
+    
+    if repo is None or repo.get('empty', True):
+        return PENDING
+    print(f"{prefix}Migrating {github_repo}... ✓ Success (finished in background)")
+    return SUCCESS
+
+def existing_repos(forgejo_url: str, forgejo_token: str, owner: str) -> Optional[set]:
+    """
+    Names (lower-cased) of the repositories the owner already has on Forgejo.
+    
+    Listing them takes one request per 50 repositories, against one
+    migration round-trip per repository to learn the same from a 409.
+    
+    Returns:
+        The set of names, or None if the inventory could not be fetched
+    """
+    try:
+        return set(forgejo_api.list_owner_repos(forgejo_url, forgejo_token, owner))
     except requests.exceptions.RequestException as e:
-        print(f"✗ Network error: {e}", file=sys.stderr)
-        return False
+        print(f"Warning: could not list existing repositories ({e}), "
+              f"checking each one on submission", file=sys.stderr)
+        return None
 
 def main():
     """Main migration workflow."""
+    console.install()
     forgejo_url, forgejo_token, github_token = check_environment()
+    metrics.start('migrate_repos2')
     
     repos_file = os.getenv('REPOS_FILE', 'repos.txt')
     forgejo_owner = os.getenv('FORGEJO_OWNER', None)
     mirror_mode = os.getenv('MIRROR', 'false').lower() == 'true'
-    delay_seconds = int(os.getenv('DELAY_SECONDS', '10'))
+    concurrency = int(os.getenv('CONCURRENCY', '4'))
+    adaptive = os.getenv('ADAPTIVE_CONCURRENCY', 'false').lower() == 'true'
+    max_concurrency = int(os.getenv('MAX_CONCURRENCY', str(concurrency * 4))) if adaptive else concurrency
+    http_client.set_pool_size(max_concurrency * 2)
+    track = os.getenv('POLL_MIGRATIONS', 'false').lower() == 'true'
+    submit_timeout = float(os.getenv('SUBMIT_TIMEOUT', '30' if track else '120'))
+    schedule = scheduling.schedule_from_env()
+    
+    # DELAY_SECONDS used to be a fixed sleep between repos; honour it as a rate
+    legacy_rate = rate_limit.rate_from_delay(os.getenv('DELAY_SECONDS'))
+    if legacy_rate is not None and os.getenv('FORGEJO_RATE') is None:
+        rate_limit.configure('forgejo', legacy_rate, 1)
+    
+    submissions = ConcurrencyLimit(concurrency, max_concurrency)
+    controller = None
+    if adaptive:
+        target_latency = float(os.getenv('TARGET_LATENCY', str(submit_timeout / 2)))
+        controller = AIMDController(submissions, target_latency)
+    # With the AIMD controller in charge of the limit, the breaker only pauses
+    breaker = breaker_from_env('Forgejo', None if adaptive else submissions)
     
     print(f"Forgejo Migration Tool (Lightweight Mode)")
     print(f"{'='*60}")
@@ -148,37 +331,138 @@ def main():
     print(f"GitHub auth:     {'✓' if github_token else '✗'}")
     print(f"Migrating:       Code + Releases only")
     print(f"Skipping:        Issues, PRs, Wiki, Milestones, Labels")
-    print(f"Delay:           {delay_seconds}s")
+    if adaptive:
+        print(f"Concurrency:     {concurrency} (adaptive, 1-{max_concurrency}, "
+              f"target latency {controller.target_latency:g}s)")
+    else:
+        print(f"Concurrency:     {concurrency}")
+    print(f"Submit timeout:  {submit_timeout:g}s{' (then poll)' if track else ''}")
+    print(f"Forgejo rate:    {rate_limit.limiter('forgejo').describe()}")
+    print(f"GitHub rate:     {rate_limit.limiter('github').describe()}")
+    print(f"Circuit breaker: {breaker.describe() if breaker else 'disabled'}")
     print(f"{'='*60}\n")
     
-    repos = read_repos_from_file(repos_file)
+    repos, sizes = read_repos_from_file(repos_file)
     
     if not repos:
         print("No repositories found in file", file=sys.stderr)
         sys.exit(1)
     
-    print(f"Found {len(repos)} repositories to migrate\n")
+    journal = journal_from_env()
+    preflight = os.getenv('PREFLIGHT', 'true').lower() == 'true'
+    owner = forgejo_owner
+    if (preflight or track or journal is not None) and not owner:
+        try:
+            owner = forgejo_api.current_user(forgejo_url, forgejo_token)
+        except requests.exceptions.RequestException as e:
+            if track:
+                print(f"Error: could not look up the Forgejo user ({e}); "
+                      f"set FORGEJO_OWNER to track migrations", file=sys.stderr)
+                sys.exit(1)
+            print(f"Warning: could not look up the Forgejo user ({e}), "
+                  f"skipping the pre-flight check", file=sys.stderr)
+            preflight = False
+    
+    resume = os.getenv('RESUME', 'false').lower() == 'true'
+    skipped = 0
+    if journal is not None:
+        # Entries name the Forgejo and owner they were for, so a resumed run
+        # against another one does not skip repositories never migrated there
+        journal.target = f"{forgejo_url.rstrip('/')}/{owner or ''}"
+    if resume and journal is not None:
+        done = completed(journal.load(), (SUCCESS, EXISTS))
+        remaining = [repo for repo in repos if repo not in done]
+        skipped = len(repos) - len(remaining)
+        repos = remaining
+        metrics.REPOS.inc(skipped, outcome='skipped')
+        print(f"Resuming from {journal.path}: {skipped} repositories already done")
+    
+    present = 0
+    if preflight and repos:
+        existing = existing_repos(forgejo_url, forgejo_token, owner)
+        if existing is not None:
+            remaining = [repo for repo in repos
+                         if repo.partition('/')[2].lower() not in existing]
+            present = len(repos) - len(remaining)
+            repos = remaining
+            metrics.REPOS.inc(present, outcome=EXISTS)
+            print(f"Pre-flight: {len(existing)} repositories on Forgejo, "
+                  f"{present} of the list already there")
     
-    success_count = 0
-    failure_count = 0
+    sizes = scheduling.load_sizes(repos, sizes)
+    print(f"Found {len(repos)} repositories to migrate, "
+          f"{scheduling.describe(repos, sizes, schedule)}\n")
     
-    for i, repo in enumerate(repos, 1):
-        print(f"[{i}/{len(repos)}] ", end="")
-        if migrate_repository(forgejo_url, forgejo_token, repo, github_token, forgejo_owner, mirror_mode):
-            success_count += 1
-        else:
-            failure_count += 1
+    reporter = progress.reporter_from_env(
+        repos, sizes, (lambda: submissions.limit) if adaptive else None)
+    
+    def migrate(i: int, repo: str) -> str:
+        if reporter is not None:
+            reporter.start(repo)
+        with timing.phase(repo, 'migrate'):
+            return migrate_repository(forgejo_url, forgejo_token, repo, github_token,
+                                      forgejo_owner, mirror_mode, prefix=f"[{i}/{len(repos)}] ",
+                                      submit_timeout=submit_timeout, track=track,
+                                      breaker=breaker, limit=submissions, controller=controller)
+    
+    engine_options = {}
+    if track:
+        def poll(i: int, repo: str) -> str:
+            with timing.phase(repo, 'poll'):
+                return check_migration(forgejo_url, forgejo_token, owner, repo,
+                                       prefix=f"[{i}/{len(repos)}] ")
         
-        if repo != repos[-1]:
-            time.sleep(delay_seconds)
+        engine_options = {
+            'poll': poll,
+            'poll_interval': float(os.getenv('POLL_INTERVAL', '5')),
+            'poll_max_interval': float(os.getenv('POLL_MAX_INTERVAL', '60')),
+            'poll_timeout': float(os.getenv('POLL_TIMEOUT', '3600')),
+            'max_pending': int(os.getenv('MAX_PENDING', str(max_concurrency * 2))),
+        }
+    
+    engine_options.update(sizes=sizes, schedule=schedule)
+    metrics.IN_FLIGHT.set_function(lambda: submissions.in_flight)
+    metrics.CONCURRENCY_LIMIT.set_function(lambda: submissions.limit)
+    
+    def on_result(repo: str, outcome: str) -> None:
+        if outcome != PENDING:
+            metrics.REPOS.inc(outcome=outcome)
+            if reporter is not None:
+                reporter.finish(repo, outcome in (SUCCESS, EXISTS))
+        if journal is not None:
+            journal.record(repo, outcome)
+    
+    engine_options['on_result'] = on_result
+    if reporter is not None:
+        reporter.begin()
+    try:
+        counts = count_outcomes(run_migrations(repos, migrate, max_concurrency, **engine_options))
+    finally:
+        if reporter is not None:
+            reporter.end()
+        if journal is not None:
+            journal.close()
+        timing.timer.close()
+    success_count = counts[SUCCESS] + counts[EXISTS] + present
+    failure_count = counts[FAILED]
     
     print(f"\n{'='*60}")
     print(f"Migration complete!")
     print(f"Successful:  {success_count}")
     print(f"Failed:      {failure_count}")
+    if present:
+        print(f"             ({present} already on Forgejo before this run)")
+    if skipped:
+        print(f"Skipped:     {skipped} (completed in an earlier run)")
+    if counts[UNCONFIRMED]:
+        print(f"Unconfirmed: {counts[UNCONFIRMED]} (still migrating when polling stopped)")
+    if adaptive:
+        print(f"Concurrency: {submissions.limit} at the end of the run")
     print(f"{'='*60}")
+    timing.timer.print_summary()
+    metrics.finish(failure_count + counts[UNCONFIRMED] == 0)
     
-    sys.exit(0 if failure_count == 0 else 1)
+    sys.exit(0 if failure_count + counts[UNCONFIRMED] == 0 else 1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Concurrent migration engine.
+
+Runs a per-repository migration function for many repositories at once,
+bounded by a configurable concurrency limit. The migration function itself
+is blocking (it talks to Forgejo through requests), so every call is handed
+to a worker thread while the event loop keeps the other slots busy.
+
+Repositories are started in the order given by their size when sizes are
+known (largest first by default, see scheduling.py).
+
+Migrations that Forgejo keeps running after the submission returned are
+reported as PENDING and tracked by polling, outside of the worker slots.
+They still count against max_pending, so the server is never left with more
+migrations running than that.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from scheduling import LARGEST_FIRST, order_by_size
+
+# Per-repository outcomes
+SUCCESS = 'success'
+EXISTS = 'exists'
+FAILED = 'failed'
+PENDING = 'pending'
+UNCONFIRMED = 'unconfirmed'
+
+# Signature of the per-repository worker: (index, repo) -> outcome
+MigrateFunc = Callable[[int, str], str]
+# Signature of a single status check for a pending repository
+PollFunc = Callable[[int, str], str]
+# Called with (repo, outcome) whenever a repository's outcome is recorded
+ResultFunc = Callable[[str, str], None]
+
+class MigrationEngine:
+    """Submit many migrations concurrently and collect their results."""
+
+    def __init__(self, migrate: MigrateFunc, concurrency: int = 4,
+                 poll: Optional[PollFunc] = None, poll_interval: float = 5,
+                 poll_max_interval: float = 60, poll_timeout: float = 3600,
+                 max_pending: int = 0, on_result: Optional[ResultFunc] = None,
+                 sizes: Optional[Dict[str, int]] = None, schedule: str = LARGEST_FIRST):
+        """
+        Args:
+            migrate: Blocking function migrating one repository
+            concurrency: Maximum number of migrations in flight
+            poll: Blocking status check for repositories reported as PENDING
+            poll_interval: Delay before the first status check
+            poll_max_interval: Upper bound for the exponential poll backoff
+            poll_timeout: Give up tracking (UNCONFIRMED) after this many seconds
+            max_pending: Maximum number of migrations being submitted or
+                         tracked at once (0 = no limit beyond concurrency)
+            on_result: Notified of every outcome, including PENDING, e.g. to journal it
+            sizes: Size in bytes per repository, used to order the queue
+            schedule: LARGEST_FIRST, SMALLEST_FIRST or FILE_ORDER
+        """
+        self.migrate = migrate
+        self.concurrency = max(1, concurrency)
+        self.poll = poll
+        self.poll_interval = poll_interval
+        self.poll_max_interval = poll_max_interval
+        self.poll_timeout = poll_timeout
+        self.max_pending = max_pending
+        self.on_result = on_result
+        self.sizes = sizes or {}
+        self.schedule = schedule
+        self.results: Dict[str, str] = {}
+        self._trackers: List[asyncio.Task] = []
+        self._running: Optional[asyncio.Semaphore] = None
+
+    def _settle(self, repo: str, status: str) -> None:
+        self.results[repo] = status
+        if self.on_result is not None:
+            self.on_result(repo, status)
+
+    async def _call(self, executor: ThreadPoolExecutor, func: Callable[[int, str], str],
+                    index: int, repo: str) -> str:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, func, index, repo)
+        except Exception as e:
+            print(f"[{index}] ✗ Unexpected error migrating {repo}: {e}")
+            return FAILED
+
+    async def _track(self, index: int, repo: str, executor: ThreadPoolExecutor) -> None:
+        """Poll a pending migration with exponential backoff until it settles."""
+        try:
+            await self._poll_until_settled(index, repo, executor)
+        finally:
+            if self._running is not None:
+                self._running.release()
+
+    async def _poll_until_settled(self, index: int, repo: str,
+                                  executor: ThreadPoolExecutor) -> None:
+        started = time.monotonic()
+        delay = self.poll_interval
+        while True:
+            await asyncio.sleep(delay)
+            status = await self._call(executor, self.poll, index, repo)
+            if status != PENDING:
+                self._settle(repo, status)
+                return
+            elapsed = time.monotonic() - started
+            if elapsed >= self.poll_timeout:
+                print(f"[{index}] ⧗ {repo} still migrating after {elapsed:.0f}s, not confirmed")
+                self._settle(repo, UNCONFIRMED)
+                return
+            delay = min(delay * 2, self.poll_max_interval,
+                        max(self.poll_timeout - elapsed, 0.1))
+
+    async def _worker(self, queue: "asyncio.Queue[Tuple[int, str]]",
+                      executor: ThreadPoolExecutor,
+                      poll_executor: ThreadPoolExecutor) -> None:
+        while True:
+            try:
+                index, repo = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+            if self._running is not None:
+                # Wait for a migration still running on the server to settle
+                await self._running.acquire()
+            status = await self._call(executor, self.migrate, index, repo)
+            if status == PENDING and self.poll is not None:
+                # Free the worker right away; the tracker reports the outcome
+                # later and keeps its place in max_pending until then
+                self._settle(repo, PENDING)
+                self._trackers.append(asyncio.create_task(
+                    self._track(index, repo, poll_executor)))
+            else:
+                if self._running is not None:
+                    self._running.release()
+                self._settle(repo, FAILED if status == PENDING else status)
+
+    async def run(self, repos: List[str]) -> Dict[str, str]:
+        """
+        Migrate all repositories.
+
+        Returns:
+            Mapping of repository to its final outcome
+        """
+        queue: "asyncio.Queue[Tuple[int, str]]" = asyncio.Queue()
+        for item in enumerate(order_by_size(repos, self.sizes, self.schedule), 1):
+            queue.put_nowait(item)
+
+        worker_count = min(self.concurrency, len(repos))
+        if self.max_pending > 0 and self.poll is not None:
+            self._running = asyncio.Semaphore(self.max_pending)
+        with ThreadPoolExecutor(max_workers=max(1, worker_count)) as executor, \
+                ThreadPoolExecutor(max_workers=max(1, worker_count)) as poll_executor:
+            workers = [asyncio.create_task(self._worker(queue, executor, poll_executor))
+                       for _ in range(worker_count)]
+            await asyncio.gather(*workers)
+            await asyncio.gather(*self._trackers)
+        return self.results
+
+def count_outcomes(results: Dict[str, str]) -> Dict[str, int]:
+    """Count repositories per outcome."""
+    counts = {SUCCESS: 0, EXISTS: 0, FAILED: 0, UNCONFIRMED: 0}
+    for status in results.values():
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+def run_migrations(repos: List[str], migrate: MigrateFunc, concurrency: int = 4,
+                   **options) -> Dict[str, str]:
+    """Run the engine to completion from synchronous code."""
+    engine = MigrationEngine(migrate, concurrency, **options)
+    return asyncio.run(engine.run(repos))
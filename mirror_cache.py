@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk cache of bare GitHub mirrors.
+
+Each repository lives in <root>/<owner>/<repo>.git. The first run clones it;
+later runs bring it up to date with `git fetch --prune`, so only new objects
+are downloaded. The refs last pushed to each destination are remembered next
+to the mirror, which lets the push send only refs that changed since then.
+
+Forks can share objects with the mirror of the repository they were forked
+from (their base) through git alternates: the fork's mirror only stores what
+the base lacks, and fetching it only downloads that. Bases are never garbage
+collected, since forks depend on objects their refs may no longer reach.
+
+The cache is bounded by a disk budget: once it is exceeded, the least
+recently used mirrors that are neither in use nor a base of another cached
+mirror are deleted.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from git_tools import git_error, run_git
+
+INDEX_FILE = 'index.json'
+
+def dir_size(path: str) -> int:
+    """Total size in bytes of the files below path."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+def read_refs(path: str) -> Dict[str, str]:
+    """Map ref name to object id for every ref in a repository."""
+    output = run_git(['for-each-ref', '--format=%(objectname) %(refname)'], cwd=path).stdout
+    refs = {}
+    for line in output.splitlines():
+        sha, name = line.split(' ', 1)
+        refs[name] = sha
+    return refs
+
+class MirrorCache:
+    """LRU-bounded collection of bare mirrors keyed by owner/repo."""
+
+    def __init__(self, root: str, budget_bytes: int = 0):
+        """
+        Args:
+            root: Directory holding the mirrors
+            budget_bytes: Disk budget for the whole cache, 0 for unbounded
+        """
+        self.root = os.path.abspath(root)
+        self.budget_bytes = budget_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._repo_locks: Dict[str, threading.Lock] = {}
+        self._in_use: Set[str] = set()
+        # Mirrors fetched by this process, so a base shared by many forks is fetched once
+        self._fresh: Set[str] = set()
+        # Bases that could not be fetched by this process; their forks stand alone
+        self._unavailable: Set[str] = set()
+        self._index = self._load_index()
+
+    # -- index -------------------------------------------------------------
+
+    def _load_index(self) -> Dict[str, Dict[str, float]]:
+        try:
+            with open(os.path.join(self.root, INDEX_FILE)) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        # Drop entries whose mirror vanished behind our back
+        return {name: entry for name, entry in index.items()
+                if os.path.isdir(self.path(name))}
+
+    def _save_index(self) -> None:
+        path = os.path.join(self.root, INDEX_FILE)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp, path)
+
+    def _touch(self, full_name: str, base: Optional[str] = None) -> None:
+        size = dir_size(self.path(full_name))
+        with self._lock:
+            entry = {'size': size, 'last_used': time.time()}
+            base = base or self._index.get(full_name, {}).get('base')
+            if base:
+                entry['base'] = base
+            self._index[full_name] = entry
+            self._fresh.add(full_name)
+            self._save_index()
+
+    # -- mirrors -----------------------------------------------------------
+
+    def path(self, full_name: str) -> str:
+        owner, repo = full_name.split('/')
+        return os.path.join(self.root, owner, f"{repo}.git")
+
+    def contains(self, full_name: str) -> bool:
+        return os.path.isdir(self.path(full_name))
+
+    def _repo_lock(self, full_name: str) -> threading.Lock:
+        with self._lock:
+            return self._repo_locks.setdefault(full_name, threading.Lock())
+
+    def acquire(self, full_name: str) -> None:
+        """Mark a mirror as in use: it will not be evicted until released."""
+        self._repo_lock(full_name).acquire()
+        with self._lock:
+            self._in_use.add(full_name)
+
+    def release(self, full_name: str) -> None:
+        with self._lock:
+            self._in_use.discard(full_name)
+        self._repo_lock(full_name).release()
+
+    def update(self, full_name: str, fetch_url: str, base: Optional[str] = None,
+               base_url: Optional[str] = None) -> str:
+        """
+        Bring the mirror of a repository up to date, cloning it if needed.
+        The caller must hold the repository (acquire()).
+
+        Args:
+            full_name: GitHub repo in format "owner/repo"
+            fetch_url: URL to fetch from; it is not stored in the mirror config,
+                       so credentials embedded in it stay off the disk
+            base: Repository this one was forked from; a new mirror borrows
+                  its objects, so only what the fork adds is downloaded
+            base_url: URL to fetch the base from
+
+        Returns:
+            Path of the bare mirror
+
+        Raises:
+            subprocess.CalledProcessError if git fails
+        """
+        path = self.path(full_name)
+        exists = os.path.isdir(path)
+        if base and (not exists or os.path.exists(_alternates_file(path))):
+            base = self._try_update_base(base, base_url, full_name, exists)
+        else:
+            base = None
+        if exists:
+            run_git(['fetch', '--prune', '--quiet', fetch_url, '+refs/*:refs/*'], cwd=path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            partial = f"{path}.partial"
+            shutil.rmtree(partial, ignore_errors=True)
+            try:
+                run_git(['init', '--bare', '--quiet', partial])
+                if base:
+                    with open(_alternates_file(partial), 'w') as f:
+                        f.write(os.path.join(self.path(base), 'objects') + '\n')
+                run_git(['fetch', '--quiet', fetch_url, '+refs/*:refs/*'], cwd=partial)
+            except subprocess.CalledProcessError:
+                shutil.rmtree(partial, ignore_errors=True)
+                if base:
+                    with self._lock:
+                        self._index.pop(full_name, None)
+                        self._save_index()
+                raise
+            os.replace(partial, path)
+        self._touch(full_name, base)
+        return path
+
+    def _try_update_base(self, base: str, base_url: str, fork: str,
+                         exists: bool) -> Optional[str]:
+        """
+        Fetch the base of a fork, falling back to a standalone mirror of a
+        new fork if the base cannot be fetched (deleted, blocked, transport
+        failure). An existing fork keeps borrowing from the base on disk.
+
+        Returns:
+            The base to borrow from, or None
+        """
+        with self._lock:
+            unavailable = base in self._unavailable
+        if not unavailable:
+            try:
+                self._update_base(base, base_url, fork)
+                return base
+            except subprocess.CalledProcessError as e:
+                with self._lock:
+                    self._unavailable.add(base)
+                print(f"Could not fetch {base}, mirroring its forks on their own: {git_error(e)}")
+        return base if exists else None
+
+    def _update_base(self, base: str, base_url: str, fork: str) -> None:
+        """
+        Fetch the base of a fork, once per process, and record the fork as
+        borrowing from it before the base is released: from then on evict()
+        keeps the base, even while the fork is still being fetched.
+        """
+        self.acquire(base)
+        try:
+            with self._lock:
+                fresh = base in self._fresh
+            if not fresh:
+                self.update(base, base_url)
+                # Forks borrow objects that a gc of the base could prune
+                run_git(['config', 'gc.auto', '0'], cwd=self.path(base))
+            with self._lock:
+                entry = self._index.setdefault(fork, {'size': 0, 'last_used': time.time()})
+                entry['base'] = base
+                self._save_index()
+        finally:
+            self.release(base)
+
+    # -- incremental pushes ------------------------------------------------
+
+    @staticmethod
+    def _state_file(path: str, destination: str) -> str:
+        key = hashlib.sha256(destination.encode()).hexdigest()[:16]
+        return os.path.join(path, f"pushed-{key}.json")
+
+    def changed_refs(self, full_name: str,
+                     destination: str) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Compare the mirror with what was last pushed to a destination.
+
+        Returns:
+            (refs to update, refs to delete), or None if nothing is known
+            about the destination and a full mirror push is needed
+        """
+        path = self.path(full_name)
+        try:
+            with open(self._state_file(path, destination)) as f:
+                pushed = json.load(f)
+        except (OSError, ValueError):
+            return None
+        current = read_refs(path)
+        updates = [ref for ref, sha in current.items() if pushed.get(ref) != sha]
+        deletes = [ref for ref in pushed if ref not in current]
+        return updates, deletes
+
+    def record_push(self, full_name: str, destination: str) -> None:
+        """Remember the refs that the destination now has."""
+        path = self.path(full_name)
+        with open(self._state_file(path, destination), 'w') as f:
+            json.dump(read_refs(path), f)
+
+    def forget_push(self, full_name: str, destination: str) -> None:
+        """Forget the destination state, e.g. because it was recreated empty."""
+        try:
+            os.remove(self._state_file(self.path(full_name), destination))
+        except OSError:
+            pass
+
+    # -- eviction ----------------------------------------------------------
+
+    def usage(self) -> int:
+        with self._lock:
+            return sum(int(entry['size']) for entry in self._index.values())
+
+    def evict(self) -> List[str]:
+        """
+        Delete least recently used mirrors until the cache fits its budget.
+        A base stays as long as a cached fork borrows its objects.
+
+        Returns:
+            Names of the evicted repositories
+        """
+        if not self.budget_bytes:
+            return []
+        evicted = []
+        with self._lock:
+            total = sum(int(entry['size']) for entry in self._index.values())
+            by_age = sorted(self._index.items(), key=lambda item: item[1]['last_used'])
+            progress = True
+            while total > self.budget_bytes and progress:
+                # Evicting the last fork of a base frees the base in the next pass
+                progress = False
+                bases = {entry.get('base') for entry in self._index.values()}
+                for name, entry in by_age:
+                    if total <= self.budget_bytes:
+                        break
+                    if name in self._in_use or name in bases or name not in self._index:
+                        continue
+                    shutil.rmtree(self.path(name), ignore_errors=True)
+                    del self._index[name]
+                    total -= int(entry['size'])
+                    evicted.append(name)
+                    progress = True
+            if evicted:
+                self._save_index()
+        return evicted
+
+def _alternates_file(path: str) -> str:
+    return os.path.join(path, 'objects', 'info', 'alternates')
+
+def push_changed(cache: MirrorCache, full_name: str, destination: str,
+                 force_full: bool = False) -> int:
+    """
+    Push a cached mirror to a destination, sending only changed refs.
+
+    Args:
+        cache: Mirror cache holding the repository
+        full_name: GitHub repo in format "owner/repo"
+        destination: Push URL
+        force_full: Ignore recorded state and push every ref (--mirror)
+
+    Returns:
+        Number of refs pushed or deleted (-1 for a full mirror push)
+
+    Raises:
+        subprocess.CalledProcessError if git fails
+    """
+    path = cache.path(full_name)
+    changes = None if force_full else cache.changed_refs(full_name, destination)
+    if changes is None:
+        run_git(['push', '--mirror', '--quiet', destination], cwd=path)
+        count = -1
+    else:
+        updates, deletes = changes
+        refspecs = [f"+{ref}:{ref}" for ref in updates] + [f":{ref}" for ref in deletes]
+        for batch in _batches(refspecs, 500):
+            run_git(['push', '--quiet', destination] + batch, cwd=path)
+        count = len(refspecs)
+    cache.record_push(full_name, destination)
+    return count
+
+def _batches(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
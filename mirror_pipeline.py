@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Two-stage worker pool for git mirroring.
+
+Downloads (clone from GitHub) and uploads (push to Forgejo) run in separate
+thread pools with their own concurrency limits, so inbound and outbound
+transfers overlap. A repository moves to the upload pool as soon as its
+download finishes. The number of repositories staged on disk at once is
+bounded so fast downloads cannot outrun slow uploads indefinitely.
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# download(item) -> staged state, or None if the item failed
+DownloadFunc = Callable[[str], Optional[Any]]
+# upload(item, staged) -> success
+UploadFunc = Callable[[str, Any], bool]
+# cleanup(item, staged) -> None, always called once the upload is over
+CleanupFunc = Callable[[str, Any], None]
+
+class MirrorPipeline:
+    """Run download and upload stages concurrently with separate limits."""
+
+    def __init__(self, download: DownloadFunc, upload: UploadFunc,
+                 cleanup: CleanupFunc, download_workers: int = 4,
+                 upload_workers: int = 4, max_staged: Optional[int] = None):
+        """
+        Args:
+            download: Blocking function fetching one repository
+            upload: Blocking function pushing a fetched repository
+            cleanup: Releases whatever download left behind
+            download_workers: Concurrent downloads
+            upload_workers: Concurrent uploads
+            max_staged: Repositories allowed on disk at once
+                        (default: download_workers + upload_workers)
+        """
+        self.download = download
+        self.upload = upload
+        self.cleanup = cleanup
+        self.download_workers = max(1, download_workers)
+        self.upload_workers = max(1, upload_workers)
+        staged = max_staged or self.download_workers + self.upload_workers
+        self._staged = threading.BoundedSemaphore(max(1, staged))
+
+    def _upload_stage(self, item: str, staged: Any) -> bool:
+        try:
+            return self.upload(item, staged)
+        finally:
+            try:
+                self.cleanup(item, staged)
+            finally:
+                self._staged.release()
+
+    def _download_stage(self, item: str,
+                        uploads: ThreadPoolExecutor) -> Optional["Future[bool]"]:
+        self._staged.acquire()
+        try:
+            staged = self.download(item)
+        except BaseException:
+            self._staged.release()
+            raise
+        if staged is None:
+            self._staged.release()
+            return None
+        return uploads.submit(self._upload_stage, item, staged)
+
+    def run(self, items: List[str]) -> Dict[str, bool]:
+        """
+        Mirror every item.
+
+        Returns:
+            Mapping of item to success
+        """
+        results: Dict[str, bool] = {}
+        with ThreadPoolExecutor(self.download_workers) as downloads, \
+                ThreadPoolExecutor(self.upload_workers) as uploads:
+            pending = {item: downloads.submit(self._download_stage, item, uploads)
+                       for item in items}
+            for item, future in pending.items():
+                try:
+                    upload = future.result()
+                    results[item] = upload.result() if upload is not None else False
+                except Exception as e:
+                    print(f"Error migrating {item}: {e}")
+                    results[item] = False
+        return results
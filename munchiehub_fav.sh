@@ -29,6 +29,26 @@ tmp="$(mktemp)"
 trap 'rm -f "$tmp" "$tmp.headers" "$tmp.body"' EXIT
 > "$tmp"
 
+# Prometheus textfile for node_exporter, written atomically when METRICS_FILE is set
+write_metrics() {
+  [[ -n "${METRICS_FILE:-}" ]] || return 0
+  local success="$1"
+  {
+    echo "# HELP munchiehub_starred_repos Starred repositories in the last export"
+    echo "# TYPE munchiehub_starred_repos gauge"
+    echo "munchiehub_starred_repos{script=\"munchiehub_fav\"} $(wc -l < "$tmp")"
+    echo "# HELP munchiehub_starred_bytes Total size of the starred repositories"
+    echo "# TYPE munchiehub_starred_bytes gauge"
+    echo "munchiehub_starred_bytes{script=\"munchiehub_fav\"} $(awk -F'\t' '{s+=$2} END {printf "%d", s}' "$tmp")"
+    echo "# HELP munchiehub_run_end_timestamp_seconds When the run finished"
+    echo "# TYPE munchiehub_run_end_timestamp_seconds gauge"
+    echo "munchiehub_run_end_timestamp_seconds{script=\"munchiehub_fav\"} $(date +%s)"
+    echo "# HELP munchiehub_run_success 1 if the last run finished without failures"
+    echo "# TYPE munchiehub_run_success gauge"
+    echo "munchiehub_run_success{script=\"munchiehub_fav\"} ${success}"
+  } > "${METRICS_FILE}.$$.tmp" && mv "${METRICS_FILE}.$$.tmp" "$METRICS_FILE"
+}
+
 page=1
 while :; do
   # Capture status and body for better diagnostics
@@ -40,6 +60,7 @@ while :; do
     sed -n '1,200p' "$tmp.body" >&2
     echo "Response headers:" >&2
     sed -n '1,50p' "$tmp.headers" >&2
+    write_metrics 0
     exit 1
   fi
 
@@ -53,6 +74,8 @@ while :; do
   page=$((page + 1))
 done
 
+write_metrics 1
+
 if [[ ! -s "$tmp" ]]; then
   echo "No starred repositories found."
   exit 0
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Live progress of a migration run.
+
+Tracks repositories started and finished, and bytes transferred, and shows
+them as one line:
+
+    ⧗ 120/2000 done, 3 failed · 8 in flight · 14.2/min · 3.1 MB/s · ETA 2h12m
+
+With adaptive concurrency, the current limit follows the in-flight count
+("8 in flight, limit 12").
+
+The ETA divides the size still to go by the bytes completed per second
+when repository sizes are known, and falls back to the completion rate
+otherwise. Updates only touch a few counters under a lock; the line is
+redrawn by a background thread at most every `interval` seconds, so
+thousands of updates cost nothing noticeable. On a terminal it is kept at
+the bottom of the output (console.set_status); elsewhere it is printed as
+a regular line every PROGRESS_INTERVAL seconds.
+
+PROGRESS=off disables it.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import console
+
+def humanize_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def humanize_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class ProgressReporter:
+    """Thread-safe progress counters with a throttled display."""
+
+    def __init__(self, repos: List[str], sizes: Optional[Dict[str, int]] = None,
+                 interval: float = 1.0, live: bool = True,
+                 limit: Optional[Callable[[], int]] = None):
+        """
+        Args:
+            repos: Every repository of the run
+            sizes: Size in bytes per repository, for the ETA
+            interval: Seconds between two redraws
+            live: Keep the line at the bottom of a terminal instead of printing it
+            limit: Returns the current concurrency limit, when it changes during the run
+        """
+        self.total = len(repos)
+        self.sizes = sizes or {}
+        self.interval = interval
+        self.live = live
+        self.limit = limit
+        known = [self.sizes[repo] for repo in repos if repo in self.sizes]
+        # Repositories of unknown size count as an average one
+        self._average = sum(known) / len(known) if known else 0
+        self._remaining_bytes = sum(self._size(repo) for repo in repos)
+        self._done_bytes = 0.0
+        self._transferred = 0
+        self._in_flight: Set[str] = set()
+        self._done = 0
+        self._failed = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _size(self, repo: str) -> float:
+        return self.sizes.get(repo, self._average)
+
+    def start(self, repo: str) -> None:
+        with self._lock:
+            self._in_flight.add(repo)
+
+    def finish(self, repo: str, ok: bool = True) -> None:
+        with self._lock:
+            self._in_flight.discard(repo)
+            self._done += 1
+            if not ok:
+                self._failed += 1
+            size = self._size(repo)
+            self._done_bytes += size
+            self._remaining_bytes -= size
+
+    def add_bytes(self, count: int) -> None:
+        """Record git data transferred by this process."""
+        with self._lock:
+            self._transferred += count
+
+    def render(self) -> str:
+        with self._lock:
+            elapsed = max(time.monotonic() - self._started, 1e-6)
+            done, failed, in_flight = self._done, self._failed, len(self._in_flight)
+            done_bytes, remaining_bytes = self._done_bytes, self._remaining_bytes
+            transferred = self._transferred
+        parts = [f"⧗ {done}/{self.total} done" + (f", {failed} failed" if failed else ""),
+                 f"{in_flight} in flight" + (f", limit {self.limit()}" if self.limit else ""),
+                 f"{done / elapsed * 60:.1f}/min"]
+        if transferred:
+            parts.append(f"{humanize_bytes(transferred / elapsed)}/s")
+        if 0 < done < self.total:
+            if done_bytes > 0 and remaining_bytes > 0:
+                eta = remaining_bytes / (done_bytes / elapsed)
+            else:
+                eta = (self.total - done) / (done / elapsed)
+            parts.append(f"ETA {humanize_duration(eta)}")
+        return ' · '.join(parts)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.draw()
+
+    def draw(self) -> None:
+        if self.live:
+            console.set_status(self.render())
+        else:
+            print(self.render())
+
+    def begin(self) -> None:
+        """Start redrawing in the background."""
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def end(self) -> None:
+        """Stop redrawing and leave the final state as a regular line."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.live:
+            console.set_status('')
+        print(self.render())
+
+def reporter_from_env(repos: List[str], sizes: Optional[Dict[str, int]] = None,
+                      limit: Optional[Callable[[], int]] = None) -> Optional[ProgressReporter]:
+    """
+    Reporter configured by PROGRESS (off disables it) and PROGRESS_INTERVAL
+    (seconds between lines when not on a terminal, default 30), or None.
+    """
+    if os.getenv('PROGRESS', 'on').lower() in ('off', 'false'):
+        return None
+    live = console.status_supported()
+    interval = 1.0 if live else float(os.getenv('PROGRESS_INTERVAL', '30'))
+    return ProgressReporter(repos, sizes, interval, live, limit)
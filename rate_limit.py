@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Token-bucket rate limiting shared by all workers.
+
+Each remote service (Forgejo, GitHub) gets its own named bucket so the two
+are paced independently. Rates are expressed in requests per minute and
+read from the environment:
+
+    FORGEJO_RATE / FORGEJO_BURST
+    GITHUB_RATE  / GITHUB_BURST
+
+A rate of 0 disables limiting for that service.
+
+RateLimitScheduler complements the buckets for GitHub: it follows the
+budget GitHub reports in X-RateLimit-* and Retry-After headers, spreads the
+remaining requests over the time left when the budget runs low, and pauses
+every worker until the reset time once it is exhausted.
+"""
+
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+DEFAULT_LIMITS = {
+    # service: (requests per minute, burst)
+    'forgejo': (30.0, 5),
+    'github': (60.0, 10),
+}
+
+class TokenBucket:
+    """Thread-safe token bucket with a configurable rate and burst size."""
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        """
+        Args:
+            rate_per_minute: Sustained number of acquisitions per minute
+            burst: Number of acquisitions allowed back to back
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """Take tokens if they are available right now, without waiting."""
+        if self.unlimited:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        Take tokens, sleeping until the bucket can cover them.
+
+        The tokens are reserved before sleeping, so concurrent callers are
+        served in arrival order instead of racing for each refill.
+
+        Returns:
+            Seconds spent waiting
+        """
+        if self.unlimited:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def describe(self) -> str:
+        if self.unlimited:
+            return "unlimited"
+        return f"{self.rate * 60:g}/min (burst {self.capacity})"
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = threading.Lock()
+
+def configure(service: str, rate_per_minute: float, burst: int) -> TokenBucket:
+    """Replace the bucket used for a service."""
+    bucket = TokenBucket(rate_per_minute, burst)
+    with _limiters_lock:
+        _limiters[service] = bucket
+    return bucket
+
+def limiter(service: str) -> TokenBucket:
+    """
+    Return the shared bucket for a service, creating it from the
+    environment (<SERVICE>_RATE / <SERVICE>_BURST) on first use.
+    """
+    with _limiters_lock:
+        bucket = _limiters.get(service)
+        if bucket is None:
+            default_rate, default_burst = DEFAULT_LIMITS.get(service, (0.0, 1))
+            prefix = service.upper()
+            rate = float(os.getenv(f'{prefix}_RATE', default_rate))
+            burst = int(os.getenv(f'{prefix}_BURST', default_burst))
+            bucket = _limiters[service] = TokenBucket(rate, burst)
+        return bucket
+
+def rate_from_delay(delay_seconds: Optional[str]) -> Optional[float]:
+    """Translate the legacy DELAY_SECONDS setting into a per-minute rate."""
+    if delay_seconds is None:
+        return None
+    delay = float(delay_seconds)
+    return 60.0 / delay if delay > 0 else 0.0
+
+def _retry_after_seconds(value: str) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimitScheduler:
+    """
+    Paces requests from the rate-limit budget reported by the server.
+
+    Budgets are tracked per resource (core, graphql, search, ...) as named
+    by the X-RateLimit-Resource header.
+    """
+
+    def __init__(self, low_water: float = 0.1, reset_slack: float = 1.0):
+        """
+        Args:
+            low_water: Fraction of the limit below which requests are spread
+                       evenly until the reset instead of sent at full speed
+            reset_slack: Seconds added after a reset time to absorb clock skew
+        """
+        self.low_water = low_water
+        self.reset_slack = reset_slack
+        self._lock = threading.Lock()
+        # resource -> (remaining, limit, reset epoch)
+        self._budgets: Dict[str, tuple] = {}
+        # resource -> epoch before which nobody may send
+        self._paused_until: Dict[str, float] = {}
+        self._next_slot: Dict[str, float] = {}
+
+    def update(self, resource: str, remaining: int, limit: int, reset: float) -> None:
+        """Record the budget for a resource, e.g. from GET /rate_limit."""
+        with self._lock:
+            previous = self._budgets.get(resource)
+            if previous is not None and previous[2] != reset:
+                # A new window: slots reserved in the old one mean nothing now
+                self._next_slot.pop(resource, None)
+            self._budgets[resource] = (remaining, limit, reset)
+            if remaining <= 0:
+                self._paused_until[resource] = max(self._paused_until.get(resource, 0),
+                                                   reset + self.reset_slack)
+
+    def observe(self, headers, status_code: int = 200, text: str = '') -> bool:
+        """
+        Update the budget from response headers.
+
+        Returns:
+            True if the response is a rate-limit rejection worth retrying
+            once the pause is over (429, or 403 with an exhausted budget,
+            a Retry-After header or a rate-limit message)
+        """
+        resource = headers.get('X-RateLimit-Resource', 'core')
+        remaining = headers.get('X-RateLimit-Remaining')
+        if remaining is not None:
+            try:
+                self.update(resource, int(remaining),
+                            int(headers.get('X-RateLimit-Limit', remaining) or 0),
+                            float(headers.get('X-RateLimit-Reset', 0) or 0))
+            except ValueError:
+                pass
+
+        if status_code not in (403, 429):
+            return False
+        retry_after = headers.get('Retry-After')
+        delay = _retry_after_seconds(retry_after) if retry_after else None
+        limited = (status_code == 429 or delay is not None or remaining == '0'
+                   or 'rate limit' in text.lower())
+        if not limited:
+            return False
+        if delay is None and remaining != '0':
+            # Secondary rate limit without guidance: GitHub asks for at least a minute
+            delay = 60.0
+        if delay is not None:
+            self.pause(resource, delay)
+        return True
+
+    def pause(self, resource: str, seconds: float) -> None:
+        """Hold every request for a resource for the given time."""
+        with self._lock:
+            until = time.time() + seconds
+            self._paused_until[resource] = max(self._paused_until.get(resource, 0), until)
+
+    def delay_for(self, resource: str = 'core') -> float:
+        """
+        Seconds the next request for a resource should wait, reserving its
+        slot when the budget is being spread out.
+        """
+        now = time.time()
+        with self._lock:
+            paused = self._paused_until.get(resource, 0) - now
+            if paused > 0:
+                return paused
+            budget = self._budgets.get(resource)
+            if budget is None:
+                return 0.0
+            remaining, limit, reset = budget
+            if reset <= now:
+                # Window rolled over; the next response will tell the new budget
+                self._next_slot.pop(resource, None)
+                return 0.0
+            if limit and remaining > limit * self.low_water:
+                return 0.0
+            slot = max(now, self._next_slot.get(resource, 0))
+            if remaining <= 0:
+                # Every request left in the window has a slot: resume at the reset
+                return reset + self.reset_slack - now
+            # Spread the remaining requests evenly between this slot and the reset
+            interval = (reset - slot) / remaining
+            self._next_slot[resource] = slot + interval
+            self._budgets[resource] = (remaining - 1, limit, reset)
+            return slot - now
+
+    def wait(self, resource: str = 'core') -> float:
+        """Block until a request for the resource may be sent."""
+        waited = 0.0
+        while True:
+            delay = self.delay_for(resource)
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+            # A paced slot is ours once slept through; a pause must be rechecked
+            with self._lock:
+                if self._paused_until.get(resource, 0) <= time.time():
+                    return waited
+
+    def remaining(self, resource: str = 'core') -> Optional[int]:
+        with self._lock:
+            budget = self._budgets.get(resource)
+        return budget[0] if budget else None
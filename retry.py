@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Retries with exponential backoff and jitter.
+
+Failures are sorted into classes, each with its own policy:
+
+    timeout       the server did not answer in time
+    throttled     HTTP 429 or 5xx: the server is overloaded or limiting us
+    transport     connection or git transport errors (DNS, resets, early EOF)
+    rate_limited  a GitHub rate limit; the caller already waited for the reset
+    permanent     HTTP 4xx, missing repository, bad credentials: never retried
+
+Attempts per class can be changed with RETRY_<CLASS>_ATTEMPTS, e.g.
+RETRY_TRANSPORT_ATTEMPTS=6; RATE_LIMIT_RETRIES also sets rate_limited.
+"""
+
+import os
+import random
+import re
+import time
+from typing import Callable, Dict, NamedTuple, Optional, TypeVar
+
+import requests
+
+TIMEOUT = 'timeout'
+THROTTLED = 'throttled'
+TRANSPORT = 'transport'
+RATE_LIMITED = 'rate_limited'
+PERMANENT = 'permanent'
+
+T = TypeVar('T')
+
+class RetryPolicy(NamedTuple):
+    max_attempts: int
+    base_delay: float = 1.0     # seconds before the first retry (upper bound)
+    max_delay: float = 60.0     # cap for the exponential growth
+
+DEFAULT_POLICIES: Dict[str, RetryPolicy] = {
+    TIMEOUT: RetryPolicy(3, 10.0, 120.0),
+    THROTTLED: RetryPolicy(5, 5.0, 120.0),
+    TRANSPORT: RetryPolicy(4, 2.0, 60.0),
+    RATE_LIMITED: RetryPolicy(4, 0.0, 0.0),
+    PERMANENT: RetryPolicy(1),
+}
+
+class RetryableError(Exception):
+    """A classified failure; retry_call() decides whether to try again."""
+
+    def __init__(self, error_class: str, message: str):
+        self.error_class = error_class
+        self.message = message
+        super().__init__(message)
+
+def policies_from_env() -> Dict[str, RetryPolicy]:
+    """DEFAULT_POLICIES with attempts overridden by RETRY_<CLASS>_ATTEMPTS."""
+    policies = dict(DEFAULT_POLICIES)
+    rate_limit_retries = os.getenv('RATE_LIMIT_RETRIES')
+    if rate_limit_retries is not None:
+        policies[RATE_LIMITED] = policies[RATE_LIMITED]._replace(
+            max_attempts=int(rate_limit_retries) + 1)
+    for name, policy in list(policies.items()):
+        attempts = os.getenv(f'RETRY_{name.upper()}_ATTEMPTS')
+        if attempts is not None and name != PERMANENT:
+            policies[name] = policy._replace(max_attempts=max(1, int(attempts)))
+    return policies
+
+POLICIES = policies_from_env()
+
+def backoff_delay(policy: RetryPolicy, attempt: int) -> float:
+    """Full-jitter exponential backoff for the retry following `attempt`."""
+    ceiling = min(policy.max_delay, policy.base_delay * (2 ** (attempt - 1)))
+    return random.uniform(0, ceiling)
+
+def retry_call(func: Callable[[int], T],
+               on_retry: Optional[Callable[[RetryableError, int, float], None]] = None,
+               policies: Optional[Dict[str, RetryPolicy]] = None,
+               sleep: Callable[[float], None] = time.sleep) -> T:
+    """
+    Call func(attempt) until it returns, retrying RetryableError per policy.
+
+    Args:
+        func: Called with the 1-based attempt number
+        on_retry: Called with (error, attempt, delay) before sleeping
+        policies: Policies per error class (default POLICIES)
+        sleep: Sleep function, replaceable for tests
+
+    Raises:
+        RetryableError once the policy of its class is exhausted
+    """
+    policies = policies or POLICIES
+    attempt = 1
+    while True:
+        try:
+            return func(attempt)
+        except RetryableError as e:
+            policy = policies.get(e.error_class, policies[PERMANENT])
+            if attempt >= policy.max_attempts:
+                raise
+            delay = backoff_delay(policy, attempt)
+            if on_retry is not None:
+                on_retry(e, attempt, delay)
+            sleep(delay)
+            attempt += 1
+
+# -- classification -------------------------------------------------------
+
+def classify_status(status_code: int) -> str:
+    """Error class of an unsuccessful HTTP status."""
+    if status_code == 429 or status_code >= 500:
+        return THROTTLED
+    if status_code == 408:
+        return TIMEOUT
+    return PERMANENT
+
+def classify_request_exception(error: requests.exceptions.RequestException) -> str:
+    """Error class of a requests exception."""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return classify_status(error.response.status_code)
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return TRANSPORT
+    if isinstance(error, requests.exceptions.Timeout):
+        return TIMEOUT
+    if isinstance(error, (requests.exceptions.ConnectionError,
+                          requests.exceptions.ChunkedEncodingError)):
+        return TRANSPORT
+    return PERMANENT
+
+_GIT_PERMANENT = re.compile(
+    r"repository .* not found|does not appear to be a git repository|does not exist"
+    r"|authentication failed|could not read username|permission denied"
+    r"|returned error: 40[0134]|invalid username or password", re.IGNORECASE)
+_GIT_THROTTLED = re.compile(r"returned error: (429|5\d\d)", re.IGNORECASE)
+_GIT_TRANSPORT = re.compile(
+    r"could not resolve host|connection (timed out|reset|refused)|timed out"
+    r"|early eof|remote end hung up|rpc failed|unable to access|broken pipe"
+    r"|gnutls|ssl|tls|unexpected disconnect|index-pack failed", re.IGNORECASE)
+
+def classify_git_error(stderr: str) -> str:
+    """Error class of a failed git clone/fetch/push from its stderr."""
+    if _GIT_THROTTLED.search(stderr):
+        return THROTTLED
+    if _GIT_PERMANENT.search(stderr):
+        return PERMANENT
+    if _GIT_TRANSPORT.search(stderr):
+        return TRANSPORT
+    return PERMANENT
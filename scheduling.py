@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Size-aware ordering of the work list.
+
+Workers take repositories from a shared queue in order, so sorting the queue
+is all the scheduling there is. Largest first (LPT) keeps a big repository
+from starting last and running alone while the other workers sit idle; the
+total time then stays close to the best possible split over N workers.
+Smallest first finishes the most repositories early instead.
+
+Sizes come from the repository list itself (a second column holding bytes
+or a human-readable size, as written by the star exporters) or from the
+star database (STAR_DB).
+"""
+
+import os
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+from units import parse_size
+
+LARGEST_FIRST = 'largest'
+SMALLEST_FIRST = 'smallest'
+FILE_ORDER = 'file'
+SCHEDULES = (LARGEST_FIRST, SMALLEST_FIRST, FILE_ORDER)
+
+def parse_repo_list(lines: Iterable[str]) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Parse 'owner/repo [size]' lines, skipping blanks and # comments.
+
+    Returns:
+        (repos in file order, size in bytes per repo that has one)
+    """
+    repos: List[str] = []
+    sizes: Dict[str, int] = {}
+    for line in lines:
+        fields = line.split()
+        if not fields or fields[0].startswith('#'):
+            continue
+        repos.append(fields[0])
+        if len(fields) > 1:
+            try:
+                sizes[fields[0]] = parse_size(''.join(fields[1:]))
+            except ValueError:
+                pass
+    return repos, sizes
+
+def load_sizes(repos: List[str], sizes: Dict[str, int]) -> Dict[str, int]:
+    """Complete sizes missing from the list with those stored in STAR_DB."""
+    star_db = os.getenv('STAR_DB')
+    if not star_db or all(repo in sizes for repo in repos):
+        return sizes
+    # Imported here so that the migration scripts do not need sqlite otherwise
+    from star_store import StarStore
+    store = StarStore(star_db)
+    try:
+        stored = store.sizes()
+    finally:
+        store.close()
+    return {**stored, **sizes}
+
+def order_by_size(repos: List[str], sizes: Dict[str, int],
+                  schedule: str = LARGEST_FIRST) -> List[str]:
+    """
+    Order repositories for the workers.
+
+    Repositories of unknown size keep their file order and come after the
+    sized ones, whichever the schedule.
+    """
+    if schedule == FILE_ORDER or not sizes:
+        return list(repos)
+    known = [repo for repo in repos if repo in sizes]
+    unknown = [repo for repo in repos if repo not in sizes]
+    known.sort(key=lambda repo: sizes[repo], reverse=schedule == LARGEST_FIRST)
+    return known + unknown
+
+def schedule_from_env() -> str:
+    """SCHEDULE: largest (default), smallest or file. Exits if it is anything else."""
+    schedule = os.getenv('SCHEDULE', LARGEST_FIRST).lower()
+    if schedule not in SCHEDULES:
+        print(f"Error: SCHEDULE must be one of {', '.join(SCHEDULES)}, not '{schedule}'",
+              file=sys.stderr)
+        sys.exit(1)
+    return schedule
+
+def describe(repos: List[str], sizes: Dict[str, int], schedule: str) -> str:
+    sized = sum(1 for repo in repos if repo in sizes)
+    if schedule == FILE_ORDER or not sized:
+        return "file order"
+    first = "largest" if schedule == LARGEST_FIRST else "smallest"
+    return f"{first} first ({sized}/{len(repos)} sizes known)"
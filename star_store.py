@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Local SQLite store of starred repositories.
+
+Keeps the last exported star list (name, size, pushed_at, starred_at,
+fetched_at) so that later runs only need to ask GitHub for stars newer
+than the most recent starred_at already stored (the watermark).
+"""
+
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# (full_name, size, pushed_at, starred_at), the field order of StarredRepo
+StarRow = Tuple[str, int, Optional[str], Optional[str]]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stars (
+    full_name  TEXT PRIMARY KEY,
+    size       INTEGER NOT NULL,
+    pushed_at  TEXT,
+    starred_at TEXT,
+    fetched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stars_starred_at ON stars (starred_at);
+"""
+
+class StarStore:
+    """SQLite-backed star list."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def watermark(self) -> Optional[str]:
+        """Most recent starred_at stored, or None if the store is empty."""
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(starred_at) FROM stars").fetchone()
+        return row[0]
+
+    def _upsert(self, rows: Iterable[Any], fetched_at: str) -> None:
+        self._conn.executemany(
+            "INSERT INTO stars (full_name, size, pushed_at, starred_at, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(full_name) DO UPDATE SET size = excluded.size, "
+            "pushed_at = excluded.pushed_at, "
+            "starred_at = COALESCE(excluded.starred_at, stars.starred_at), "
+            "fetched_at = excluded.fetched_at",
+            [(row.full_name, row.size, row.pushed_at, row.starred_at, fetched_at)
+             for row in rows])
+
+    def upsert(self, rows: Iterable[Any], fetched_at: str) -> None:
+        """Insert new stars and refresh the ones already known."""
+        with self._lock, self._conn:
+            self._upsert(rows, fetched_at)
+
+    def replace_all(self, rows: Iterable[Any], fetched_at: str) -> None:
+        """Store a complete star list, dropping repositories no longer starred."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM stars")
+            self._upsert(rows, fetched_at)
+
+    def all(self) -> List[StarRow]:
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT full_name, size, pushed_at, starred_at FROM stars")
+            return list(cursor)
+
+    def sizes(self) -> Dict[str, int]:
+        """Map full_name to size in bytes."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT full_name, size FROM stars"))
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+List starred GitHub repositories with their sizes (no cloning).
+
+Python counterpart of munchiehub_fav.sh. By default the list is fetched
+through the GraphQL API, asking only for the four fields we keep, in pages of
+100 items. If GraphQL is unavailable the REST API is used instead: page 1 of
+the starred list is read first, its Link header tells how many pages there
+are, and the remaining pages are then fetched concurrently over a pooled
+connection.
+
+Configuration comes from the same environment variables as the shell script:
+GITHUB_TOKEN (required), GITHUB_USERNAME, PER_PAGE, API_VERSION, USER_AGENT,
+plus EXPORT_WORKERS for the number of REST pages fetched at once and
+EXPORT_API (auto, graphql or rest).
+
+With STAR_DB set, the list is also kept in a local SQLite store, and
+INCREMENTAL=true asks GitHub only for stars newer than the last stored one
+(most recent first, stopping at that watermark). Unstarred repositories and
+size changes are only picked up by a full (non-incremental) run.
+"""
+
+import math
+import os
+import sys
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import http_client
+import metrics
+from http_cache import cached_get
+from star_store import StarStore
+
+# REST media type that adds starred_at and nests the repository under "repo"
+STAR_MEDIA_TYPE = 'application/vnd.github.star+json'
+
+class StarredRepo(NamedTuple):
+    full_name: str
+    size: int                   # bytes
+    pushed_at: Optional[str] = None
+    starred_at: Optional[str] = None
+
+STARRED_QUERY = """
+query($login: String!, $viewer: Boolean!, $first: Int!, $after: String) {
+  viewer @include(if: $viewer) { ...stars }
+  user(login: $login) @skip(if: $viewer) { ...stars }
+}
+fragment stars on User {
+  starredRepositories(first: $first, after: $after) {
+    pageInfo { hasNextPage endCursor }
+    edges { starredAt node { nameWithOwner diskUsage pushedAt } }
+  }
+}
+"""
+
+class GraphQLUnavailable(Exception):
+    """The GraphQL API refused or failed the query."""
+
+class GitHubAPIError(Exception):
+    """A starred-list page could not be fetched."""
+
+    def __init__(self, page: int, response: Optional[requests.Response] = None,
+                 reason: str = ''):
+        self.page = page
+        self.response = response
+        status = response.status_code if response is not None else '000'
+        super().__init__(f"GitHub API error on page {page} (HTTP {status}){': ' + reason if reason else ''}")
+
+def check_environment() -> Tuple[str, Optional[str]]:
+    """Return (token, username), exiting if the token is missing."""
+    token = os.getenv('GITHUB_TOKEN')
+    if not token:
+        print("Error: GITHUB_TOKEN is required", file=sys.stderr)
+        sys.exit(1)
+    return token, os.getenv('GITHUB_USERNAME') or None
+
+def starred_endpoint(username: Optional[str] = None) -> str:
+    """/users/:username/starred if a username is given, else /user/starred."""
+    if username:
+        return f"{http_client.GITHUB_API_URL}/users/{username}/starred"
+    return f"{http_client.GITHUB_API_URL}/user/starred"
+
+def fetch_page(session: requests.Session, endpoint: str, page: int,
+               per_page: int, **params: str) -> requests.Response:
+    """Fetch one page of the starred list, raising GitHubAPIError unless HTTP 200."""
+    try:
+        response = cached_get(session, endpoint,
+                              params={'per_page': per_page, 'page': page, **params},
+                              headers={'Accept': STAR_MEDIA_TYPE}, timeout=60)
+    except requests.exceptions.RequestException as e:
+        raise GitHubAPIError(page, reason=str(e))
+    if response.status_code != 200:
+        raise GitHubAPIError(page, response)
+    return response
+
+def last_page(response: requests.Response) -> int:
+    """Read the last page number from the Link header (1 if there is none)."""
+    last = response.links.get('last', {}).get('url')
+    if not last:
+        return 1
+    return int(parse_qs(urlparse(last).query).get('page', ['1'])[0])
+
+def repo_rows(items: List[Dict[str, Any]]) -> List[StarredRepo]:
+    rows = []
+    for item in items:
+        # star+json wraps the repository; plain JSON returns it directly
+        repo = item.get('repo', item)
+        # GitHub reports the repository size in KB
+        rows.append(StarredRepo(repo['full_name'], (repo.get('size') or 0) * 1024,
+                                repo.get('pushed_at'), item.get('starred_at')))
+    return rows
+
+def fetch_starred_rest(session: requests.Session, endpoint: str, per_page: int = 100,
+                       workers: int = 8) -> List[StarredRepo]:
+    """
+    Fetch the whole starred list through the REST API.
+
+    Args:
+        session: Pooled GitHub session
+        endpoint: Starred-list URL
+        per_page: Items per page (max 100)
+        workers: Pages fetched concurrently after the first one
+
+    Returns:
+        List of starred repositories
+    """
+    first = fetch_page(session, endpoint, 1, per_page)
+    rows = repo_rows(first.json())
+    pages = range(2, last_page(first) + 1)
+    if not pages:
+        return rows
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for response in pool.map(lambda page: fetch_page(session, endpoint, page, per_page), pages):
+            rows.extend(repo_rows(response.json()))
+    return rows
+
+def fetch_starred_since(session: requests.Session, endpoint: str, watermark: str,
+                        per_page: int = 100) -> List[StarredRepo]:
+    """
+    Fetch stars newer than the watermark, most recent first.
+
+    Pages are read one at a time and fetching stops at the first star older
+    than the watermark, so a daily refresh usually costs a single request.
+    """
+    rows: List[StarredRepo] = []
+    page = 1
+    while True:
+        response = fetch_page(session, endpoint, page, per_page,
+                              sort='created', direction='desc')
+        for row in repo_rows(response.json()):
+            if row.starred_at and row.starred_at < watermark:
+                return rows
+            rows.append(row)
+        if page >= last_page(response):
+            return rows
+        page += 1
+
+def fetch_starred_graphql(session: requests.Session, username: Optional[str] = None,
+                          per_page: int = 100) -> List[StarredRepo]:
+    """
+    Fetch the whole starred list through the GraphQL API, following cursors.
+
+    Only nameWithOwner, diskUsage, pushedAt and starredAt are requested,
+    which is a small fraction of the REST repository objects.
+
+    Raises:
+        GraphQLUnavailable if the endpoint errors or rejects the query
+    """
+    url = f"{http_client.GITHUB_API_URL}/graphql"
+    variables: Dict[str, Any] = {
+        'login': username or '',
+        'viewer': not username,
+        'first': min(per_page, 100),
+        'after': None,
+    }
+    rows: List[StarredRepo] = []
+    while True:
+        try:
+            response = session.post(url, json={'query': STARRED_QUERY, 'variables': variables},
+                                    timeout=60)
+        except requests.exceptions.RequestException as e:
+            raise GraphQLUnavailable(str(e))
+        if response.status_code != 200:
+            raise GraphQLUnavailable(f"HTTP {response.status_code}")
+        try:
+            body = response.json()
+        except ValueError:
+            raise GraphQLUnavailable("invalid JSON response")
+        if body.get('errors'):
+            raise GraphQLUnavailable(body['errors'][0].get('message', 'query failed'))
+
+        owner = (body.get('data') or {}).get('viewer' if not username else 'user')
+        if owner is None:
+            raise GraphQLUnavailable(f"user '{username}' not found")
+        stars = owner['starredRepositories']
+        for edge in stars['edges']:
+            node = edge['node']
+            rows.append(StarredRepo(node['nameWithOwner'], (node.get('diskUsage') or 0) * 1024,
+                                    node.get('pushedAt'), edge.get('starredAt')))
+
+        if not stars['pageInfo']['hasNextPage']:
+            return rows
+        variables['after'] = stars['pageInfo']['endCursor']
+
+def humanize(size: int) -> str:
+    """Format bytes like `numfmt --to=iec --suffix=B --format=%.1f`."""
+    units = ['', 'K', 'M', 'G', 'T', 'P', 'E']
+    value = float(size)
+    unit = 0
+    while value >= 1024 and unit < len(units) - 1:
+        value /= 1024
+        unit += 1
+    if unit:
+        # numfmt rounds away from zero, which may carry into the next unit
+        value = math.ceil(value * 10) / 10
+        if value >= 1024 and unit < len(units) - 1:
+            value = math.ceil(value / 1024 * 10) / 10
+            unit += 1
+    return f"{value:.1f}{units[unit]}B"
+
+def print_table(rows: List[StarredRepo]) -> None:
+    """Print repositories sorted by size, largest first."""
+    for row in sorted(rows, key=lambda row: row.size, reverse=True):
+        print(f"{row.full_name:<60} {humanize(row.size):>12}")
+
+def report_error(error: GitHubAPIError) -> None:
+    print(error, file=sys.stderr)
+    if error.response is not None:
+        print(error.response.text, file=sys.stderr)
+        print("Response headers:", file=sys.stderr)
+        for key, value in error.response.headers.items():
+            print(f"{key}: {value}", file=sys.stderr)
+
+def fetch_starred(session: requests.Session, username: Optional[str], api: str = 'auto',
+                  per_page: int = 100, workers: int = 8) -> List[StarredRepo]:
+    """
+    Fetch the complete starred list, through GraphQL when allowed and
+    available, otherwise through REST.
+
+    Raises:
+        GitHubAPIError if the list cannot be fetched
+    """
+    if api in ('auto', 'graphql'):
+        try:
+            return fetch_starred_graphql(session, username, per_page)
+        except GraphQLUnavailable as e:
+            if api == 'graphql':
+                raise GitHubAPIError(1, reason=f"GraphQL: {e}")
+            print(f"GraphQL unavailable ({e}), falling back to REST", file=sys.stderr)
+    return fetch_starred_rest(session, starred_endpoint(username), per_page, workers)
+
+def main():
+    """Export the starred list."""
+    token, username = check_environment()
+    per_page = min(int(os.getenv('PER_PAGE', '100')), 100)
+    workers = int(os.getenv('EXPORT_WORKERS', '8'))
+    api = os.getenv('EXPORT_API', 'auto').lower()
+    star_db = os.getenv('STAR_DB')
+    incremental = os.getenv('INCREMENTAL', 'false').lower() == 'true'
+
+    http_client.set_pool_size(workers)
+    metrics.start('starred_export')
+    session = http_client.github_session(token)
+    store = StarStore(star_db) if star_db else None
+    fetched_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    watermark = store.watermark() if store and incremental else None
+
+    try:
+        if watermark:
+            new_rows = fetch_starred_since(session, starred_endpoint(username), watermark, per_page)
+            store.upsert(new_rows, fetched_at)
+            print(f"{len(new_rows)} new stars since {watermark}", file=sys.stderr)
+            rows = [StarredRepo(*row) for row in store.all()]
+        else:
+            rows = fetch_starred(session, username, api, per_page, workers)
+            if store:
+                store.replace_all(rows, fetched_at)
+    except GitHubAPIError as e:
+        report_error(e)
+        metrics.finish(success=False)
+        sys.exit(1)
+    metrics.STARRED.set(len(rows))
+    metrics.finish()
+
+    if not rows:
+        print("No starred repositories found.")
+        return
+    print_table(rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Per-phase timing of the migration pipeline.
+
+Each repository goes through phases (waiting for rate limits, API requests,
+clone, push, cleanup, ...). When timing is enabled, every phase is measured
+with time.monotonic(), written as a JSON line to TIMING_FILE and summarized
+at the end of the run with percentiles per phase:
+
+    {"repo": "owner/repo", "phase": "clone", "seconds": 12.41, "ok": true, "time": 1716...}
+
+TIMING=true enables the summary without writing a file.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+class PhaseTimer:
+    """Collects phase durations from many threads."""
+
+    def __init__(self, enabled: bool = True, path: Optional[str] = None):
+        """
+        Args:
+            enabled: When False, phases are not measured at all
+            path: JSON-lines file the samples are appended to
+        """
+        self.enabled = enabled
+        self.path = path
+        self._samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+    def record(self, repo: str, phase: str, seconds: float, ok: bool = True) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._samples.setdefault(phase, []).append(seconds)
+            if self.path:
+                if self._file is None:
+                    self._file = open(self.path, 'a', buffering=1)
+                self._file.write(json.dumps({'repo': repo, 'phase': phase,
+                                             'seconds': round(seconds, 4), 'ok': ok,
+                                             'time': time.time()}) + '\n')
+
+    @contextmanager
+    def phase(self, repo: str, name: str) -> Iterator[None]:
+        """Measure the enclosed block; an exception marks the sample as failed."""
+        if not self.enabled:
+            yield
+            return
+        started = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(repo, name, time.monotonic() - started, ok)
+
+    def call(self, repo: str, name: str, func: Callable[..., T], *args: Any) -> T:
+        """Time func(*args); a result of None or False marks the sample as failed."""
+        if not self.enabled:
+            return func(*args)
+        started = time.monotonic()
+        result = None
+        try:
+            result = func(*args)
+            return result
+        finally:
+            self.record(repo, name, time.monotonic() - started,
+                        result is not None and result is not False)
+
+    def summary(self) -> List[str]:
+        """Table lines with count, total and p50/p95/p99 per phase."""
+        with self._lock:
+            samples = {phase: sorted(values) for phase, values in self._samples.items()}
+        lines = [f"{'Phase':<12} {'Count':>6} {'Total':>9} {'p50':>8} {'p95':>8} {'p99':>8}"]
+        for phase, values in samples.items():
+            lines.append(f"{phase:<12} {len(values):>6} {sum(values):>8.1f}s "
+                         f"{percentile(values, 50):>7.2f}s {percentile(values, 95):>7.2f}s "
+                         f"{percentile(values, 99):>7.2f}s")
+        return lines
+
+    def print_summary(self) -> None:
+        if self.enabled and self._samples:
+            print("\nTiming per phase:")
+            for line in self.summary():
+                print(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+def timer_from_env() -> PhaseTimer:
+    path = os.getenv('TIMING_FILE') or None
+    enabled = bool(path) or os.getenv('TIMING', 'false').lower() == 'true'
+    return PhaseTimer(enabled, path)
+
+# Shared by the modules of one run
+timer = timer_from_env()
+phase = timer.phase
+record = timer.record
+call = timer.call
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Parsing of human-readable sizes, shared by the settings and the repository lists.
+"""
+
+SIZE_SUFFIXES = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+def parse_size(value: str) -> int:
+    """Parse a size such as '500M' or '20G' into bytes (0 means unbounded)."""
+    value = value.strip().upper().rstrip('B').rstrip('I')
+    if value and value[-1] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(float(value or 0))